@@ -0,0 +1,136 @@
+"""
+Benchmarks for compile_spwn, Scene.from_dict and save_project on synthetic
+projects. spwn is replaced by benchmarks/fake_spwn.py, so only our side of
+the build is measured. Every case runs in its own process so its peak RSS
+is not mixed with the others. Run from the repository root:
+
+    python -m benchmarks.compiler --sizes 1000 10000 100000 1000000 --out bench.json
+
+The results are written as JSON with sorted keys, one entry per case, so
+two runs can be diffed or compared by a script.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import engine.compiler as compile
+from engine import scene as scene_model
+from engine.budget import Budget
+from benchmarks.synthetic import synthetic_scenes
+
+SCHEMA = 1
+FAKE_SPWN = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_spwn.py")]
+NO_LIMITS = Budget(objects=(None, None), triggers=(None, None), group_id=(None, None),
+                   scene_objects=(None, None), screen_objects=(None, None))
+
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def run_case(objects, scenes, script_density, backend):
+    project = synthetic_scenes(objects, scenes, script_density)
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        project_path = os.path.join(tmp, "project.json")
+        start = time.perf_counter()
+        scene_model.save_project(project, project_path)
+        metrics["save_seconds"] = time.perf_counter() - start
+        metrics["project_bytes"] = os.path.getsize(project_path)
+
+        del project
+        start = time.perf_counter()
+        project = scene_model.load_project(project_path)
+        metrics["load_seconds"] = time.perf_counter() - start
+
+        traces = []
+        devnull = open(os.devnull, "w")
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            compile.compile_spwn(project, "bench.spwn", "bench", build_folder=os.path.join(tmp, "build"),
+                                 backend=backend, budget=NO_LIMITS, optimize=(), spwn=FAKE_SPWN,
+                                 on_trace=traces.append)
+        finally:
+            sys.stdout = stdout
+            devnull.close()
+
+    trace = traces[0]
+    phases = {phase["name"]: phase["wall"] for phase in trace["phases"]}
+    codegen = phases["codegen"] + phases["write_root"] + phases["scripts"]
+    metrics["codegen_seconds"] = codegen
+    metrics["codegen_objects_per_second"] = objects / codegen if codegen else None
+    metrics["compile_seconds"] = trace["wall"]
+    metrics["output_bytes"] = trace["counters"]["bytes_written"]
+    metrics["peak_rss_bytes"] = peak_rss()
+    return metrics
+
+def run_case_process(case):
+    # A fresh interpreter per case keeps the peak RSS figures honest.
+    args = [sys.executable, "-m", "benchmarks.compiler", "--case", json.dumps(case, sort_keys=True)]
+    output = subprocess.run(args, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the compiler on synthetic projects.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--scenes", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--script-density", type=float, nargs="+", default=[0.0, 0.1])
+    parser.add_argument("--backend", nargs="+", choices=compile.BACKENDS, default=["spwn"])
+    parser.add_argument("--out", help="write the results to this file")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        case = json.loads(args.case)
+        print(json.dumps(run_case(**case), sort_keys=True))
+        return 0
+
+    results = []
+    for objects in args.sizes:
+        for scenes in args.scenes:
+            for script_density in args.script_density:
+                for backend in args.backend:
+                    case = {"objects": objects, "scenes": scenes, "script_density": script_density, "backend": backend}
+                    metrics = run_case_process(case)
+                    results.append({"case": case, "metrics": metrics})
+                    rss = metrics["peak_rss_bytes"]
+                    print(f"{objects:>8} objects {scenes:>3} scenes {script_density:>4} scripts {backend:>11}: "
+                          f"codegen {metrics['codegen_seconds']:7.3f}s, {metrics['output_bytes']:>11}B, "
+                          f"load {metrics['load_seconds']:6.3f}s, save {metrics['save_seconds']:6.3f}s, "
+                          f"rss {rss // (1024 * 1024) if rss else '?'}MB")
+
+    report = {
+        "schema": SCHEMA,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+    else:
+        print(json.dumps(report, indent=4, sort_keys=True))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
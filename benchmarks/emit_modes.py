@@ -0,0 +1,52 @@
+"""
+Compares the per-object $.add output (backend "spwn") with the compact
+table output (backend "table"): generated source size and, when spwn is on
+the PATH, how long `spwn build` takes on it. Run from the repository root:
+
+    python -m benchmarks.emit_modes 1000 10000 50000
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import engine.compiler as compile
+from benchmarks.synthetic import synthetic_scenes
+
+MODES = ("spwn", "table")
+
+def source_size(folder):
+    return sum(os.path.getsize(os.path.join(folder, item)) for item in os.listdir(folder) if item.startswith("scene_"))
+
+def build_mode(scenes, mode, folder):
+    os.makedirs(folder)
+    start = time.perf_counter()
+    modules = compile.write_scene_modules(scenes, folder, backend=mode)
+    codegen = time.perf_counter() - start
+    scene_statements = [(scene.name, statement, []) for scene, (statement, _) in zip(scenes, modules)]
+    with open(os.path.join(folder, "bench.spwn"), "w") as file:
+        file.writelines(compile.root_chunks(compile.read_engine_func(), scene_statements))
+
+    spwn_seconds = None
+    if shutil.which("spwn"):
+        start = time.perf_counter()
+        subprocess.run(["spwn", "build", "bench.spwn", "--no-level"], cwd=folder, capture_output=True)
+        spwn_seconds = time.perf_counter() - start
+    return codegen, source_size(folder), spwn_seconds
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [1000, 10000, 50000]
+    print(f"{'objects':>9} {'mode':>6} {'codegen':>9} {'source':>12} {'spwn build':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            scenes = synthetic_scenes(size)
+            for mode in MODES:
+                codegen, size_bytes, spwn_seconds = build_mode(scenes, mode, os.path.join(tmp, f"{mode}_{size}"))
+                spwn_text = f"{spwn_seconds:10.2f}s" if spwn_seconds is not None else "    no spwn"
+                print(f"{size:>9} {mode:>6} {codegen:8.3f}s {size_bytes:>11}B {spwn_text}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,27 @@
+import random
+
+from engine.scene import GameObject, Scene
+
+def synthetic_scenes(objects, scenes=1, script_density=0.0, seed=0):
+    # Deterministic for a given seed, so runs on different commits compile the
+    # exact same project.
+    rng = random.Random(seed)
+    result = []
+    per_scene = objects // scenes
+    for scene_index in range(scenes):
+        scene = Scene(f"scene {scene_index}")
+        count = per_scene + (1 if scene_index < objects % scenes else 0)
+        for i in range(count):
+            script = ""
+            if rng.random() < script_density:
+                script = f"wait({rng.randint(1, 5)})\nchange_scene({rng.randrange(scenes)})"
+            scene.objects.append(GameObject(
+                obj_id=rng.choice((1, 2, 3, 8, 211)),
+                x=rng.randrange(0, 30 * 1000, 30),
+                y=rng.randrange(0, 30 * 30, 30),
+                rotation=rng.choice((0, 0, 0, 90, 180, 270)),
+                name=f"Object {i}",
+                script=script
+            ))
+        result.append(scene)
+    return result
@@ -0,0 +1,97 @@
+"""
+Headless compiler for saved projects, made for CI boxes with no display.
+It never imports tkinter.
+
+    python -m engine.batch "projects/*.json" --jobs 4 --max-spwn 1
+
+Binary .gdproj projects are built the same way.
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import engine.compiler as compile
+from engine.projectfile import open_project
+from engine.budget import Budget
+
+def expand_projects(patterns):
+    projects = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        for path in matches:
+            if path not in projects:
+                projects.append(path)
+    return projects
+
+def project_key(path):
+    # Build subfolder of a project, projects with the same file name in
+    # different folders must not share it.
+    level_name = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    return f"{level_name}-{digest}"
+
+def build_project(path, spwn_slots, backend="spwn", workers=1, budget=None, image_data=(), midi_data=()):
+    level_name = os.path.splitext(os.path.basename(path))[0]
+    start = time.perf_counter()
+    summary = {"project": path, "level": level_name, "ok": False, "error": None}
+    try:
+        scenes = open_project(path)
+        result = compile.compile_spwn(scenes, "PROJ_" + level_name + ".compiled.spwn", level_name,
+                                      backend=backend, workers=workers, spwn_slots=spwn_slots, budget=budget,
+                                      project=project_key(path), image_data=image_data, midi_data=midi_data)
+        summary["ok"] = result.returncode == 0
+        if not summary["ok"]:
+            summary["error"] = f"spwn exited with {result.returncode}"
+    except Exception as e:
+        summary["error"] = f"{type(e).__name__}: {e}"
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+def build_projects(projects, jobs=1, max_spwn=1, backend="spwn", workers=1, budget=None, image_data=(), midi_data=()):
+    spwn_slots = threading.BoundedSemaphore(max_spwn)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(build_project, path, spwn_slots, backend, workers, budget, image_data, midi_data) for path in projects]
+        return [future.result() for future in futures]
+
+def print_summary(summaries):
+    print()
+    for summary in summaries:
+        status = "OK  " if summary["ok"] else "FAIL"
+        line = f"{status} {summary['seconds']:8.2f}s  {summary['project']}"
+        if summary["error"]:
+            line += f"  ({summary['error']})"
+        print(line)
+    failed = sum(1 for summary in summaries if not summary["ok"])
+    total = sum(summary["seconds"] for summary in summaries)
+    print(f"{len(summaries) - failed}/{len(summaries)} projects compiled, {total:.2f}s total")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile saved projects without the GUI.")
+    parser.add_argument("projects", nargs="+", help="project json files or glob patterns")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="projects compiled at the same time")
+    parser.add_argument("--max-spwn", type=int, default=1, help="spwn processes allowed to run at the same time")
+    parser.add_argument("--backend", choices=compile.BACKENDS, default="spwn")
+    parser.add_argument("--workers", type=int, default=1, help="processes used for scene codegen per project")
+    parser.add_argument("--max-objects", type=int, default=80000, help="fail projects with more objects than this")
+    parser.add_argument("--max-group", type=int, default=999, help="fail projects that need group ids above this")
+    parser.add_argument("--image-data", action="append", default=[], metavar="PATH",
+                        help="engine/img data file built into the levels, counted in the object budget")
+    parser.add_argument("--midi-data", action="append", default=[], metavar="PATH",
+                        help="engine/midi data file built into the levels, counted in the trigger budget")
+    args = parser.parse_args(argv)
+    budget = Budget(objects=(args.max_objects // 2, args.max_objects), group_id=(args.max_group - 49, args.max_group))
+
+    projects = expand_projects(args.projects)
+    summaries = build_projects(projects, args.jobs, args.max_spwn, args.backend, args.workers, budget,
+                               args.image_data, args.midi_data)
+    print_summary(summaries)
+    return 0 if all(summary["ok"] for summary in summaries) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Checks a project against level budgets before anything is handed to spwn,
+so a level that is too heavy for Geometry Dash fails in milliseconds instead
+of after a full build.
+"""
+
+import os
+
+from engine.scene import object_records
+
+FIRST_SCENE_GROUP = 800
+SCREEN_WIDTH = 570
+
+class BudgetError(Exception):
+    def __init__(self, report):
+        self.report = report
+        super().__init__("; ".join(report.errors))
+
+class Budget:
+    # Every limit is a (warn, fail) pair, None switches that side off.
+    def __init__(self, objects=(40000, 80000), triggers=(5000, 20000), group_id=(950, 999),
+                 scene_objects=(20000, None), screen_objects=(2000, None)):
+        self.limits = {
+            "objects": objects,
+            "triggers": triggers,
+            "group_id": group_id,
+            "scene_objects": scene_objects,
+            "screen_objects": screen_objects,
+        }
+
+class BudgetReport:
+    def __init__(self):
+        self.objects = 0
+        self.triggers = 0
+        self.max_group_id = 0
+        self.user_groups = 0
+        self.scenes = []
+        self.warnings = []
+        self.errors = []
+
+    def check(self, budget, name, value, label):
+        warn, fail = budget.limits[name]
+        if fail is not None and value > fail:
+            self.errors.append(f"{label}: {value} is over the limit of {fail}")
+        elif warn is not None and value > warn:
+            self.warnings.append(f"{label}: {value} is over the recommended {warn}")
+
+def script_triggers(script):
+    # Every statement of an object script ends up as at least one trigger.
+    return sum(1 for line in script.splitlines() if line.strip() and not line.strip().startswith("//"))
+
+def image_objects(data_path):
+    # engine/img writes "<width> x <height>/..." and main.spwn adds one object
+    # per pixel.
+    with open(data_path, "r") as f:
+        header = f.read(64).split("/")[0]
+    width, height = header.split(" x ")
+    return int(width) * int(height)
+
+def midi_triggers(data_path):
+    # engine/midi writes one character per note and create_triggers.spwn adds
+    # one sfx trigger per note, spaces are rests.
+    count = 0
+    with open(data_path, "r") as f:
+        for block in iter(lambda: f.read(1 << 16), ""):
+            count += len(block) - block.count(" ") - block.count("\n")
+    return count
+
+def analyze(scenes, budget=None, image_data=(), midi_data=()):
+    budget = budget or Budget()
+    report = BudgetReport()
+    user_groups = set()
+
+    for index, scene in enumerate(scenes):
+        screens = {}
+        triggers = 0
+        for x, groups, script in object_records(scene.objects, ("x", "groups", "script")):
+            screen = int(x // SCREEN_WIDTH)
+            screens[screen] = screens.get(screen, 0) + 1
+            user_groups.update(groups)
+            if script:
+                triggers += script_triggers(script)
+        info = {
+            "name": scene.name,
+            "group": FIRST_SCENE_GROUP + index,
+            "objects": len(scene.objects),
+            "triggers": triggers,
+            "screen_objects": max(screens.values(), default=0),
+        }
+        report.scenes.append(info)
+        report.objects += info["objects"] + triggers
+        report.triggers += triggers
+        report.check(budget, "scene_objects", info["objects"], f"Scene {scene.name!r} objects")
+        report.check(budget, "screen_objects", info["screen_objects"], f"Scene {scene.name!r} objects on one screen")
+
+    # A data file that was passed but can't be found would leave its objects
+    # out of the totals, so it fails the check instead.
+    for path in image_data:
+        if not os.path.exists(path):
+            report.errors.append(f"Image data {path!r} not found")
+            continue
+        report.objects += image_objects(path)
+    for path in midi_data:
+        if not os.path.exists(path):
+            report.errors.append(f"Midi data {path!r} not found")
+            continue
+        notes = midi_triggers(path)
+        report.objects += notes
+        report.triggers += notes
+
+    report.user_groups = len(user_groups)
+    if scenes:
+        report.max_group_id = FIRST_SCENE_GROUP + len(scenes) - 1
+    report.check(budget, "objects", report.objects, "Total objects")
+    report.check(budget, "triggers", report.triggers, "Total triggers")
+    report.check(budget, "group_id", report.max_group_id, "Highest scene group")
+    report.check(budget, "group_id", report.max_group_id + report.user_groups, "Scene groups plus object groups")
+    return report
+
+def enforce(report):
+    for warning in report.warnings:
+        print(f"Warning: {warning}")
+    if report.errors:
+        raise BudgetError(report)
@@ -0,0 +1,58 @@
+import json
+import time
+from contextlib import contextmanager
+
+def cpu_seconds():
+    # CPU time of the thread running the build. engine.batch runs several
+    # builds in one process, the process totals would mix them up. Child
+    # processes of the build report their own time through add_cpu.
+    return time.thread_time()
+
+class BuildTrace:
+    def __init__(self, **info):
+        self.info = info
+        self.phases = []
+        self.counters = {}
+        self.started_at = time.time()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = cpu_seconds()
+        self._child_cpu = 0.0
+
+    @contextmanager
+    def phase(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        child_start = self._child_cpu
+        try:
+            yield
+        finally:
+            self.phases.append({
+                "name": name,
+                "wall": time.perf_counter() - wall_start,
+                "cpu": cpu_seconds() - cpu_start + self._child_cpu - child_start,
+            })
+
+    def add_cpu(self, seconds):
+        # CPU time of a child process of this build (codegen workers, spwn),
+        # counted in the phase it ran in.
+        self._child_cpu += seconds
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        self.counters[name] = value
+
+    def to_dict(self):
+        return {
+            **self.info,
+            "started_at": self.started_at,
+            "wall": time.perf_counter() - self._wall_start,
+            "cpu": cpu_seconds() - self._cpu_start + self._child_cpu,
+            "phases": self.phases,
+            "counters": self.counters,
+        }
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
@@ -0,0 +1,29 @@
+class Camera:
+    # Maps scene coordinates to canvas pixels. (x, y) is the scene point shown
+    # at the top left corner of the canvas.
+    def __init__(self, x=0, y=0, zoom=1.0, min_zoom=0.05, max_zoom=8.0):
+        self.x = x
+        self.y = y
+        self.zoom = zoom
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+
+    def to_screen(self, x, y):
+        return (x - self.x) * self.zoom, (y - self.y) * self.zoom
+
+    def to_world(self, screen_x, screen_y):
+        return screen_x / self.zoom + self.x, screen_y / self.zoom + self.y
+
+    def visible_rect(self, width, height):
+        return self.x, self.y, self.x + width / self.zoom, self.y + height / self.zoom
+
+    def pan(self, screen_dx, screen_dy):
+        self.x -= screen_dx / self.zoom
+        self.y -= screen_dy / self.zoom
+
+    def zoom_at(self, factor, screen_x, screen_y):
+        # Keeps the scene point under the cursor where it is.
+        world_x, world_y = self.to_world(screen_x, screen_y)
+        self.zoom = min(self.max_zoom, max(self.min_zoom, self.zoom * factor))
+        self.x = world_x - screen_x / self.zoom
+        self.y = world_y - screen_y / self.zoom
@@ -1,52 +1,187 @@
 import os
-import shutil
+import re
 import uuid
-import random
-import string
-
-debug=True
-
-def copy_files(src_folder, dest_folder):
-    os.makedirs(dest_folder, exist_ok=True)
-    for item in os.listdir(src_folder):
-        src_item = os.path.join(src_folder, item)
-        dest_item = os.path.join(dest_folder, item)
-        if os.path.isfile(src_item):
-            shutil.copy(src_item, dest_item)
-            print(f"Copied {src_item} to {dest_item}")
-
-def random_string(length):
-    randomchars = string.ascii_letters + string.digits
-    random_str = ''.join(random.choice(randomchars) for _ in range(length))
-    return random_str
-
-def compile_spwn(scenes, filename, compiled_level_name):
-    uid_folder = f"builds/{uuid.uuid4()}"
-    os.makedirs(uid_folder, exist_ok=True)
-    print(f"Created temporary folder: {uid_folder}")
+import hashlib
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from engine.workspace import prepare_workspace, release_workspace, prune_modules, ENGINE_FUNC_FOLDER
+from engine.buildtrace import BuildTrace
+from engine import budget as level_budget
+from engine.scripts import compile_scene_scripts
+from engine.optimize import optimize_scenes, PASSES
+from engine.scene import ObjectList, object_records
 
-    try:
-        utils_folder = "engine/utils"
-        engine_func_folder = "engine/engine_func"
+WRITE_BUFFER = 1 << 16
+MODULE_IMPORT = re.compile(r'import "(scene_[0-9a-f]+\.spwn)"')
+# Object fields each backend writes out.
+CODE_FIELDS = ("obj_id", "x", "y", "rotation", "color_id", "groups", "scale")
+TABLE_FIELDS = ("obj_id", "x", "y", "rotation", "scale")
+
+def scene_module_chunks(scene, scene_group):
+    yield """#[cache_output]
+extract obj_props;
+"""
+    for obj_id, x, y, rotation, color_id, groups, scale in object_records(scene.objects, CODE_FIELDS):
+        scaling = f"\n    SCALING: {scale}," if scale != 1 else ""
+        yield f"""
+$.add(obj{{
+    OBJ_ID: {obj_id},
+    X: {x}+100,
+    Y: {y}+100,
+    ROTATION: {rotation},{scaling}
+    //COLOR: "{color_id}",
+    GROUPS: {scene_group}g //{list(groups)}
+}});
+"""
+
+def table_module_chunks(scene):
+    # One row per object instead of one $.add per object, the module just
+    # returns the table and add_object_table in engine.spwn adds the objects.
+    yield """#[cache_output]
+// OBJ_ID, X, Y, ROTATION, SCALING
+return [
+"""
+    for obj_id, x, y, rotation, scale in object_records(scene.objects, TABLE_FIELDS):
+        yield f"[{obj_id},{x},{y},{rotation},{scale}],\n"
+    yield "]\n"
+
+def write_scene_module(scene, scene_group, folder, backend="spwn"):
+    # Modules are named after their content, so an unchanged scene keeps its
+    # file and spwn can reuse the #[cache_output] result from the last build.
+    # The code is streamed to a temporary file and hashed on the way, so the
+    # scene never has to exist as one big string.
+    # Returns the name of the module and its size in bytes.
+    if backend == "table":
+        chunks = table_module_chunks(scene)
+    else:
+        chunks = scene_module_chunks(scene, scene_group)
+    digest = hashlib.sha1()
+    size = 0
+    tmp_path = os.path.join(folder, f".scene_{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, 'w', buffering=WRITE_BUFFER) as file:
+        for chunk in chunks:
+            data = chunk.encode()
+            digest.update(data)
+            size += len(data)
+            file.write(chunk)
+    module_name = f"scene_{digest.hexdigest()[:16]}.spwn"
+    module_path = os.path.join(folder, module_name)
+    if os.path.exists(module_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, module_path)
+        print(f"Scene module generated at: {module_path}")
+    return module_name, size
 
-        if os.path.exists(utils_folder):
-            copy_files(utils_folder, uid_folder)
-            print(f"Copied {utils_folder} to {uid_folder}/utils")
+def module_statement(module_name, scene_group, backend="spwn"):
+    # The statement the root file uses to pull a scene module in.
+    if backend == "table":
+        return f'add_object_table(import "{module_name}", {scene_group}g);'
+    return f'import "{module_name}";'
+
+# Geometry Dash object string keys for the static properties we emit.
+OBJECT_KEYS = {
+    "OBJ_ID": 1,
+    "X": 2,
+    "Y": 3,
+    "ROTATION": 6,
+    "SCALING": 32,
+    "GROUPS": 57,
+}
+
+BACKENDS = ("spwn", "table", "levelstring")
+
+def format_level_number(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+def encode_object(obj_id, x, y, rotation, scale, scene_group):
+    pairs = [
+        f"{OBJECT_KEYS['OBJ_ID']},{obj_id}",
+        f"{OBJECT_KEYS['X']},{format_level_number(x + 100)}",
+        f"{OBJECT_KEYS['Y']},{format_level_number(y + 100)}",
+        f"{OBJECT_KEYS['ROTATION']},{format_level_number(rotation)}",
+    ]
+    if scale != 1:
+        pairs.append(f"{OBJECT_KEYS['SCALING']},{format_level_number(scale)}")
+    pairs.append(f"{OBJECT_KEYS['GROUPS']},{scene_group}")
+    return ",".join(pairs) + ";"
+
+def level_string_chunks(scenes):
+    SceneGroup = 800
+    for scene in scenes:
+        for obj_id, x, y, rotation, scale in object_records(scene.objects, TABLE_FIELDS):
+            yield encode_object(obj_id, x, y, rotation, scale, SceneGroup)
+        SceneGroup += 1
+
+def decode_level_string(level_string):
+    objects = []
+    for entry in level_string.split(";"):
+        if not entry:
+            continue
+        parts = entry.split(",")
+        if len(parts) % 2:
+            raise ValueError(f"Malformed object string: {entry!r}")
+        objects.append({int(parts[i]): parts[i + 1] for i in range(0, len(parts), 2)})
+    return objects
+
+def write_level_string(scenes, path):
+    with open(path, 'w', buffering=WRITE_BUFFER) as file:
+        file.writelines(level_string_chunks(scenes))
+    print(f"Level string generated at: {path}")
+    return os.path.getsize(path)
+
+def timed_scene_module(scene, scene_group, folder, backend="spwn"):
+    # write_scene_module in a worker process, with the CPU time it took
+    # there for the build trace.
+    start = time.process_time()
+    written = write_scene_module(scene, scene_group, folder, backend)
+    return written, time.process_time() - start
+
+def write_scene_modules(scenes, folder, workers=1, backend="spwn", trace=None):
+    # Scene groups are handed out before any work starts, so every module only
+    # depends on its own scene and the pool can write them in any order. The
+    # statements come back in scene order either way, with the number of
+    # bytes written for each. workers=1 stays in-process, which is what you
+    # want when debugging. The CPU time of the workers goes to trace when
+    # given.
+    groups = [800 + i for i in range(len(scenes))]
+    # Table modules don't depend on the scene group, a duplicated scene that
+    # still shares its objects (see ObjectList.copy) uses the module of the
+    # scene it was copied from instead of writing the same one again.
+    sources = list(range(len(scenes)))
+    if backend == "table":
+        for i, scene in enumerate(scenes):
+            if isinstance(scene.objects, ObjectList):
+                sources[i] = next((j for j in range(i) if scene.objects.same_objects(scenes[j].objects)), i)
+    jobs = [(scenes[i], groups[i]) for i in range(len(scenes)) if sources[i] == i]
+    if workers == 1 or len(jobs) < 2:
+        written = [write_scene_module(scene, group, folder, backend) for scene, group in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(timed_scene_module, scene, group, folder, backend) for scene, group in jobs]
+            timed = [future.result() for future in futures]
+        written = [module for module, _ in timed]
+        if trace is not None:
+            trace.add_cpu(sum(cpu for _, cpu in timed))
+    written = iter(written)
+    names = {}
+    statements = []
+    for i, (source, group) in enumerate(zip(sources, groups)):
+        if source == i:
+            names[i], size = next(written)
         else:
-            print(f"Warning: {utils_folder} not found")
-
-        if os.path.exists(engine_func_folder):
-            copy_files(engine_func_folder, uid_folder)
-            print(f"Copied {engine_func_folder} to {uid_folder}/engine_func")
-            
-            engine_func_content = ""
-            for item in os.listdir(engine_func_folder):
-                item_path = os.path.join(engine_func_folder, item)
-                if os.path.isfile(item_path):
-                    with open(item_path, 'r') as f:
-                        engine_func_content += f.read() + "\n"
-
-            spwn_code = f"""
+            size = 0
+        statements.append((module_statement(names[source], group, backend), size))
+    return statements
+
+def root_chunks(engine_func_content, scene_statements, script_functions=()):
+    # scene_statements holds (scene name, module statement, script calls) per
+    # scene, script_functions the shared script functions they call.
+    yield f"""
 extract obj_props;
 //GENERATED WITH GEOMETRY DASH GAME ENGINE//
 let engineeVrsion = "1.0";
@@ -63,47 +198,161 @@ game = import "engine.spwn";
 {engine_func_content}
 ///////////////////////
 
-//-------GAME-------\\
 """
-
-        else:
-            print(f"Warning: {engine_func_folder} not found")
-
-        SceneGroup = 800
-        for scene in scenes:
-            spwn_code += f"// Scene: {scene.name}\n"
-            for obj in scene.objects:
-                objId = random_string(10)
-                spwn_code += f"""
-$.add(obj{{
-    OBJ_ID: {obj.obj_id},
-    X: {obj.x}+100,
-    Y: {obj.y}+100,
-    ROTATION: {obj.rotation},
-    //COLOR: "{obj.color_id}",
-    GROUPS: {SceneGroup}g //{obj.groups if obj.groups else []}
-}});
-"""
-                if obj.script:
-                    spwn_code += f"""
-// Script for object {obj.obj_id}
-/*{obj.script}*/
-"""
-            spwn_code += """
+    if script_functions:
+        yield "//------SCRIPTS-------\\\n"
+        for function in script_functions:
+            yield function.code()
+        yield "///////////////////////\n\n"
+    yield "//-------GAME-------\\\n"
+    for scene_name, statement, script_calls in scene_statements:
+        yield f"// Scene: {scene_name}\n"
+        if statement:
+            yield statement + "\n"
+        for call in script_calls:
+            yield f"{call}!;\n"
+        yield """
 /*game.*/countScene();
 """
-            SceneGroup += 1
-        spwn_file_path = os.path.join(uid_folder, filename)
-        with open(spwn_file_path, 'w') as file:
-            file.write(spwn_code)
-        print(f'SPWN file generated at: {spwn_file_path}')
 
-        os.chdir(uid_folder)
-        
-        os.system(f'spwn build {filename} --level-name "{compiled_level_name}"')
+def read_engine_func():
+    engine_func_content = ""
+    if not os.path.exists(ENGINE_FUNC_FOLDER):
+        return engine_func_content
+    for item in sorted(os.listdir(ENGINE_FUNC_FOLDER)):
+        item_path = os.path.join(ENGINE_FUNC_FOLDER, item)
+        if os.path.isfile(item_path):
+            with open(item_path, 'r') as f:
+                engine_func_content += f.read() + "\n"
+    return engine_func_content
+
+def run_spwn(folder, filename, compiled_level_name, spwn="spwn"):
+    # spwn is the executable, or a list of arguments to start it with.
+    # Returns the finished process and the CPU seconds spwn used, read from
+    # its own resource usage so other builds running next to it don't count.
+    # The CPU time is None where the platform doesn't report it (Windows).
+    command = [spwn] if isinstance(spwn, str) else list(spwn)
+    args = command + ["build", filename, "--level-name", compiled_level_name]
+    cpu = None
+    try:
+        # Output goes to files rather than pipes, so the process can be
+        # waited for with wait4 without pipes filling up.
+        with tempfile.TemporaryFile("w+") as stdout, tempfile.TemporaryFile("w+") as stderr:
+            process = subprocess.Popen(args, cwd=folder, stdout=stdout, stderr=stderr, text=True)
+            if hasattr(os, "wait4"):
+                _, status, usage = os.wait4(process.pid, 0)
+                process.returncode = os.waitstatus_to_exitcode(status)
+                cpu = usage.ru_utime + usage.ru_stime
+            else:
+                process.wait()
+            stdout.seek(0)
+            stderr.seek(0)
+            result = subprocess.CompletedProcess(args, process.returncode, stdout.read(), stderr.read())
+    except FileNotFoundError as e:
+        result = subprocess.CompletedProcess(args, 127, "", f"spwn not found, make sure it is installed ({e})\n")
+    if result.stdout:
+        print(result.stdout, end="")
+    if result.stderr:
+        print(result.stderr, end="")
+    return result, cpu
+
+def compile_spwn(scenes, filename, compiled_level_name, build_folder=None, backend="spwn", workers=1, spwn_slots=None, on_trace=None, budget=None, optimize=PASSES, spwn="spwn", project=None, image_data=(), midi_data=()):
+    # backend="spwn" adds every object through $.add in spwn. backend="table"
+    # packs each scene into a compact table that engine.spwn adds in one loop.
+    # backend="levelstring" writes the static objects straight to
+    # <filename>.objects.txt in the GD object string format, and spwn only
+    # builds the engine runtime.
+    # workers is the number of processes used to generate scene modules,
+    # None means one per CPU. spwn_slots is an optional semaphore held while
+    # spwn runs, to cap how many spwn processes run at once. spwn is the
+    # command used to start spwn. project names the subfolder of the shared
+    # workspace the build happens in, the root file name without extension
+    # when None.
+    # Timings and counters of every phase are written to
+    # <filename>.trace.json and passed to on_trace(trace) when given. CPU
+    # times only count this build: its own thread, its codegen workers and
+    # its spwn process.
+    # The project is checked against budget (a budget.Budget, the default
+    # one when None) first and budget.BudgetError is raised before anything
+    # is written if it does not fit, counting the objects of the engine/img
+    # data files in image_data and the triggers of the engine/midi ones in
+    # midi_data built into the same level. Before that the optimize passes (see
+    # optimize.py, an empty tuple turns them off) drop duplicated and hidden
+    # objects and merge uniform blocks. Object scripts become shared trigger
+    # functions, scripts.ScriptError is raised for scripts that do not
+    # translate.
+    # Returns the finished spwn process.
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    trace = BuildTrace(filename=filename, level_name=compiled_level_name, backend=backend, workers=workers)
 
+    with trace.phase("optimize"):
+        scenes, removed = optimize_scenes(scenes, optimize)
+    for name, count in removed.items():
+        print(f"Optimization {name} removed {count} objects")
+        trace.set(f"optimize_{name}_removed", count)
+
+    with trace.phase("analyze"):
+        report = level_budget.analyze(scenes, budget, image_data, midi_data)
+    level_budget.enforce(report)
+    trace.set("triggers", report.triggers)
+    trace.set("max_group_id", report.max_group_id)
+
+    with trace.phase("workspace"):
+        folder = prepare_workspace(build_folder, project=project or os.path.splitext(filename)[0])
+    print(f"Using build workspace: {folder}")
+    try:
+        with trace.phase("read_engine_func"):
+            engine_func_content = read_engine_func()
+
+        trace.set("scenes", len(scenes))
+        trace.set("objects", sum(len(scene.objects) for scene in scenes))
+        with trace.phase("scripts"):
+            script_functions, scene_calls = compile_scene_scripts(scenes)
+        trace.set("scripts", len(script_functions))
+
+        with trace.phase("codegen"):
+            if backend == "levelstring":
+                trace.count("bytes_written", write_level_string(scenes, os.path.join(folder, filename + ".objects.txt")))
+                statements = [None for scene in scenes]
+            else:
+                modules = write_scene_modules(scenes, folder, workers, backend, trace)
+                trace.count("bytes_written", sum(size for _, size in modules))
+                statements = [statement for statement, _ in modules]
+        scene_statements = [(scene.name, statement, calls) for scene, statement, calls in zip(scenes, statements, scene_calls)]
+
+        spwn_file_path = os.path.join(folder, filename)
+        with trace.phase("write_root"):
+            with open(spwn_file_path, 'w', buffering=WRITE_BUFFER) as file:
+                file.writelines(root_chunks(engine_func_content, scene_statements, script_functions))
+        trace.count("bytes_written", os.path.getsize(spwn_file_path))
+        prune_modules(folder, {name for statement in statements if statement for name in MODULE_IMPORT.findall(statement)})
+        print(f'SPWN file generated at: {spwn_file_path}')
+
+        if spwn_slots:
+            with trace.phase("spwn_wait"):
+                spwn_slots.acquire()
+        try:
+            with trace.phase("spwn"):
+                result, spwn_cpu = run_spwn(folder, filename, compiled_level_name, spwn)
+                if spwn_cpu is not None:
+                    trace.add_cpu(spwn_cpu)
+        finally:
+            if spwn_slots:
+                spwn_slots.release()
+        trace.set("spwn_exit_status", result.returncode)
+        trace.set("spwn_seconds", trace.phases[-1]["wall"])
+        trace.set("spwn_cpu", spwn_cpu)
+        trace_data = trace.to_dict()
+        trace.write(spwn_file_path + ".trace.json")
     finally:
-        if not debug:
-            shutil.rmtree(uid_folder)
-            uid_folder = f"builds/{uuid.uuid4()}"
+        release_workspace(folder)
+
+    if on_trace:
+        on_trace(trace_data)
+
+    if result.returncode == 0:
         print("Project compiled!")
+    else:
+        print(f"spwn build failed with exit code {result.returncode}")
+    return result
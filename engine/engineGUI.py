@@ -1,64 +1,38 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
-import json
 import os
 import shutil
 import uuid
 import engine.compiler as compile
+from engine import projectfile
+from engine.scene import GameObject, Scene
+from engine.budget import BudgetError
+from engine.scripts import ScriptError
+from engine.spatial import SpatialGrid
+from engine.camera import Camera
+from engine.search import ObjectSearch
+from engine.widgets import VirtualList
+from engine.palette import Palette, channel_id, channel_label
+from engine.transform import BulkTransform
+from engine.journal import Journal, object_indexes, object_values
+from engine.importer import ProjectImport, ProjectImportError
 from math import cos, sin, radians
 from tkinter import colorchooser
 import random
+import time
 
-scenesNumber = 0
-
-class GameObject:
-    def __init__(self, obj_id, x=0, y=0, rotation=0, color_id=None, groups=None, name="", script=""):
-        self.obj_id = obj_id
-        self.x = x
-        self.y = y
-        self.rotation = rotation
-        self.color_id = color_id
-        self.groups = groups if groups is not None else []
-        self.name = name
-        self.script = script
-    
-    def get_position(self):
-        return self.x, self.y
-
-
-class Scene:
-    def __init__(self, name):
-        global scenesNumber
-        scenesNumber += 1
-        self.name = name
-        self.sceneID = 800 + scenesNumber
-        self.objects = []
-
-    
-    def to_dict(self):
-        return {
-            "name": self.name,
-            "objects": [obj.__dict__ for obj in self.objects],
-            "id": self.sceneID
-        }
-    
-    @classmethod
-    def from_dict(cls, data):
-        scene = cls(data["name"])
-        scene.objects = []
-        for obj_data in data["objects"]:
-            obj = GameObject(
-                obj_id=obj_data["obj_id"],
-                x=obj_data["x"],
-                y=obj_data["y"],
-                rotation=obj_data["rotation"],
-                color_id=obj_data["color_id"],
-                groups=obj_data["groups"],
-                name=obj_data["name"],
-                script=obj_data["script"]
-            )
-            scene.objects.append(obj)
-        return scene
+# How far from an object a click still picks it, in canvas pixels.
+PICK_DISTANCE = 15
+SELECTION_OUTLINE = "#00FFFF"
+# Below this zoom objects are drawn as plain squares, without labels or
+# rotation lines.
+DETAIL_ZOOM = 0.5
+ZOOM_STEP = 1.2
+# Redraws are held back to at most one per frame.
+FRAME_INTERVAL_MS = 16
+# How often the editor checks whether the autosave needs a new snapshot.
+AUTOSAVE_CHECK_MS = 5000
+PROJECT_FILETYPES = [("JSON files", "*.json"), ("Binary projects", "*" + projectfile.EXTENSION)]
 
 class ScriptEditorPopup:
     def __init__(self, parent, script, apply_callback):
@@ -81,10 +55,10 @@ class ScriptEditorPopup:
         self.popup.destroy()
 
 class ProjectSettingsPopup:
-    def __init__(self, parent, project_settings, apply_callback):
+    def __init__(self, parent, palette, apply_callback):
         self.parent = parent
         self.apply_callback = apply_callback
-        self.project_settings = project_settings.copy() 
+        self.palette = palette.copy()
         
         self.popup = tk.Toplevel(parent)
         self.popup.title("Project Settings")
@@ -112,44 +86,80 @@ class ProjectSettingsPopup:
     def create_color_settings(self, frame):
         ttk.Label(frame, text="Color Settings", font=('Helvetica', 12, 'bold')).pack(pady=10)
         
-        self.color_listbox = tk.Listbox(frame, selectmode=tk.SINGLE)
-        self.color_listbox.pack(side=tk.LEFT, fill=tk.Y)
-        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.color_listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.color_listbox.config(yscrollcommand=scrollbar.set)
+        # Only the visible channels are put in the listbox.
+        self.color_list = VirtualList(frame, lambda: len(self.palette), self.color_row_text, on_select=self.select_color)
+        self.color_list.pack(side=tk.LEFT, fill=tk.Y)
         
-        self.color_square = tk.Canvas(frame, width=30, height=30, bg="#FFFFFF", highlightthickness=0)
+        self.color_square = tk.Canvas(frame, width=30, height=30, bg=self.palette.default, highlightthickness=0)
         self.color_square.pack(pady=10)
         
         ttk.Button(frame, text="Edit Color", command=self.edit_color).pack()
         
-        self.color_ids = []
-        for i in range(1000):
-            color_id = f"Color {i + 1}"
-            self.color_listbox.insert(tk.END, color_id)
-            self.color_ids.append(color_id)
-        
-        self.color_listbox.bind("<ButtonRelease-1>", self.select_color)
+        self.color_list.refresh()
+    
+    def color_row_text(self, index):
+        channel = index + 1
+        if channel in self.palette.overrides:
+            return f"{channel_label(channel)}  {self.palette.overrides[channel]}"
+        return channel_label(channel)
     
     def select_color(self, event):
-        selected_index = self.color_listbox.curselection()
+        selected_index = self.color_list.curselection()
         if selected_index:
-            color_id = self.color_ids[selected_index[0]]
-            color = self.project_settings.get(color_id, "#FFFFFF")
-            self.color_square.config(bg=color)
+            self.color_square.config(bg=self.palette.get(selected_index[0] + 1))
     
     def edit_color(self):
-        selected_index = self.color_listbox.curselection()
+        selected_index = self.color_list.curselection()
         if selected_index:
-            color_id = self.color_ids[selected_index[0]]
-            color = self.project_settings.get(color_id, "#FFFFFF")
-            new_color = colorchooser.askcolor(color=color)[1]
+            channel = selected_index[0] + 1
+            new_color = colorchooser.askcolor(color=self.palette.get(channel))[1]
             if new_color:
-                self.project_settings[color_id] = new_color
+                self.palette.set(channel, new_color)
                 self.color_square.config(bg=new_color)
+                self.color_list.refresh_row(selected_index[0])
     
     def apply_settings(self):
-        self.apply_callback(self.project_settings)
+        self.apply_callback(self.palette)
+        self.popup.destroy()
+
+class ImportPopup:
+    def __init__(self, parent, filename, done_callback):
+        self.parent = parent
+        self.done_callback = done_callback
+        self.project = ProjectImport(filename)
+        
+        self.popup = tk.Toplevel(parent)
+        self.popup.title("Load Project")
+        self.popup.protocol("WM_DELETE_WINDOW", self.cancel)
+        
+        self.label = ttk.Label(self.popup, text=f"Loading {os.path.basename(filename)}...")
+        self.label.pack(padx=10, pady=10)
+        self.progressbar = ttk.Progressbar(self.popup, length=300, maximum=100)
+        self.progressbar.pack(padx=10)
+        ttk.Button(self.popup, text="Cancel", command=self.cancel).pack(pady=5)
+        
+        self.job = self.parent.after(1, self.step)
+    
+    def step(self):
+        if self.project.cancelled:
+            return
+        try:
+            done = self.project.step()
+        except (OSError, ProjectImportError) as e:
+            self.popup.destroy()
+            messagebox.showerror("Load Project", str(e))
+            return
+        if done:
+            self.popup.destroy()
+            self.done_callback(self.project.scenes, self.project.filename)
+            return
+        self.progressbar["value"] = self.project.progress() * 100
+        self.label.config(text=f"{self.project.objects} objects loaded")
+        self.job = self.parent.after(1, self.step)
+    
+    def cancel(self):
+        self.parent.after_cancel(self.job)
+        self.project.cancel()
         self.popup.destroy()
 
 class EngineGUI:
@@ -160,19 +170,69 @@ class EngineGUI:
         self.root.iconbitmap("icon.ico")
         
         self.scenes = []
+        # canvas item ids of every drawn object: obj -> (rectangle, text, rotation line or None)
+        self.canvas_items = {}
+        # spatial index per scene, built the first time it is needed
+        self.spatial_indexes = {}
+        # name and group search per scene, and the object indexes the list
+        # currently shows (None when it is not filtered)
+        self.search_indexes = {}
+        self.object_rows = None
+        self.selected_objects = set()
+        self.drag_object = None
+        self.rubber_band = None
+        self.camera = Camera()
+        self.pan_start = None
+        # Objects edited since the last frame, and whether the whole view
+        # has to be rebuilt instead.
+        self.dirty_objects = set()
+        self.full_redraw = False
+        self.redraw_job = None
+        self.last_redraw = 0.0
         self.current_scene_index = -1
         self.selected_object_index = -1
-        self.project_settings = {
-            "Color1": "#FFFFFF"
-        }
+        self.palette = Palette()
+        self.journal = Journal()
         
         self.create_menu()
         self.create_scene_panel()
         self.create_object_panel()
         self.create_property_panel()
         self.create_canvas()
-        
-        self.draw_scene()
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
+        
+        self.recover_autosave()
+        self.journal.start(self.scenes)
+        self.root.after(AUTOSAVE_CHECK_MS, self.check_autosave)
+        self.schedule_redraw()
+    
+    def recover_autosave(self):
+        # Autosave files left behind mean the editor did not close cleanly.
+        try:
+            scenes = self.journal.recover()
+        except Exception as e:
+            messagebox.showerror("Autosave", f"The autosaved project could not be read:\n{e}")
+            return
+        if scenes is not None and messagebox.askyesno("Autosave", "The editor did not close properly last time. Restore the autosaved project?"):
+            self.scenes = scenes
+            self.update_scene_listbox()
+    
+    def check_autosave(self):
+        if self.journal.needs_snapshot():
+            self.journal.compact(self.scenes)
+        for error in self.journal.take_errors():
+            messagebox.showerror("Save", str(error))
+        self.root.after(AUTOSAVE_CHECK_MS, self.check_autosave)
+    
+    def record(self, *edit):
+        self.journal.record(*edit)
+    
+    def record_set(self, **fields):
+        self.journal.record("set", self.current_scene_index, self.selected_object_index, fields)
+    
+    def quit(self):
+        self.journal.close()
+        self.root.destroy()
     
     def create_menu(self):
         menubar = tk.Menu(self.root)
@@ -180,17 +240,35 @@ class EngineGUI:
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="New Scene", command=self.new_scene)
         file_menu.add_command(label="Delete Scene", command=self.delete_scene)
+        file_menu.add_command(label="Duplicate Scene", command=self.duplicate_scene)
         file_menu.add_separator()
         file_menu.add_command(label="Save Project", command=self.save_project)
         file_menu.add_command(label="Load Project", command=self.load_project)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.root.quit)
+        file_menu.add_command(label="Exit", command=self.quit)
         
         project_menu = tk.Menu(menubar, tearoff=0)
         project_menu.add_command(label="Project Settings", command=self.open_project_settings)
         
+        arrange_menu = tk.Menu(menubar, tearoff=0)
+        arrange_menu.add_command(label="Move...", command=self.move_selection)
+        arrange_menu.add_command(label="Rotate...", command=self.rotate_selection)
+        arrange_menu.add_command(label="Scale...", command=self.scale_selection)
+        arrange_menu.add_command(label="Mirror Horizontally", command=lambda: self.transform_selection(lambda t: t.mirror("x")))
+        arrange_menu.add_command(label="Mirror Vertically", command=lambda: self.transform_selection(lambda t: t.mirror("y")))
+        arrange_menu.add_command(label="Duplicate...", command=self.duplicate_selection)
+        arrange_menu.add_command(label="Instance...", command=self.instance_selection)
+        arrange_menu.add_separator()
+        for label, edge in (("Align Left", "left"), ("Align Right", "right"), ("Align Top", "top"),
+                            ("Align Bottom", "bottom"), ("Align Centers Horizontally", "center_x"),
+                            ("Align Centers Vertically", "center_y")):
+            arrange_menu.add_command(label=label, command=lambda edge=edge: self.transform_selection(lambda t: t.align(edge)))
+        arrange_menu.add_command(label="Distribute Horizontally", command=lambda: self.transform_selection(lambda t: t.distribute("x")))
+        arrange_menu.add_command(label="Distribute Vertically", command=lambda: self.transform_selection(lambda t: t.distribute("y")))
+        
         menubar.add_cascade(label="File", menu=file_menu)
         menubar.add_cascade(label="Project", menu=project_menu)
+        menubar.add_cascade(label="Arrange", menu=arrange_menu)
         
         menubar.add_command(label="Compile Project", command=self.compile_project)
 
@@ -218,16 +296,16 @@ class EngineGUI:
         
         ttk.Label(object_panel, text="Objects", font=('Helvetica', 12, 'bold')).pack(pady=5)
         
-        self.object_listbox = tk.Listbox(object_panel, selectmode=tk.SINGLE)
-        self.object_listbox.pack(expand=True, fill=tk.BOTH)
-        self.object_listbox.bind("<ButtonRelease-1>", self.select_object)
-        self.object_listbox.bind("<B1-Motion>", self.move_object)
+        # "text" filters by name, "^text" by name prefix and "group:name" by group
+        self.object_filter = tk.StringVar()
+        self.object_filter.trace_add("write", lambda *args: self.update_object_listbox())
+        ttk.Entry(object_panel, textvariable=self.object_filter).pack(fill=tk.X, padx=5)
         
-        scrollbar = ttk.Scrollbar(object_panel, orient=tk.VERTICAL, command=self.object_listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.object_listbox.config(yscrollcommand=scrollbar.set)
+        self.object_list = VirtualList(object_panel, self.object_row_count, self.object_row_text, on_select=self.select_object)
+        self.object_list.pack(expand=True, fill=tk.BOTH)
         
         ttk.Button(object_panel, text="Add Object", command=self.add_object).pack(pady=5)
+        ttk.Button(object_panel, text="Delete Object", command=self.delete_object).pack(pady=5)
         #ttk.Button(object_panel, text="Rename Object", command=self.rename_object).pack(pady=5)
     
     def create_property_panel(self):
@@ -236,55 +314,82 @@ class EngineGUI:
         
         ttk.Label(property_panel, text="Properties", font=('Helvetica', 12, 'bold')).pack(pady=5)
         
+        # The widgets are built once and rebound to whichever object is
+        # selected; the frame is hidden while nothing is.
         self.property_frame = ttk.Frame(property_panel)
-        self.property_frame.pack(expand=True, fill=tk.BOTH)
         
-    def update_property_panel(self):
-        for widget in self.property_frame.winfo_children():
-            widget.destroy()
+        ttk.Label(self.property_frame, text="Name:").grid(row=0, column=0, sticky=tk.W, padx=5)
+        self.name_entry = ttk.Entry(self.property_frame)
+        self.name_entry.grid(row=0, column=1, padx=5)
+        self.name_entry.bind("<Return>", self.update_object_name)
+        
+        ttk.Label(self.property_frame, text="Position:").grid(row=1, column=0, sticky=tk.W, padx=5)
+        self.position_x_entry = ttk.Entry(self.property_frame, width=5)
+        self.position_x_entry.grid(row=1, column=1, padx=5)
+        self.position_x_entry.bind("<Return>", self.update_object_position)
+        self.position_y_entry = ttk.Entry(self.property_frame, width=5)
+        self.position_y_entry.grid(row=1, column=2, padx=5)
+        self.position_y_entry.bind("<Return>", self.update_object_position)
+        
+        ttk.Label(self.property_frame, text="Rotation:").grid(row=2, column=0, sticky=tk.W, padx=5)
+        self.rotation_entry = ttk.Entry(self.property_frame, width=10)
+        self.rotation_entry.grid(row=2, column=1, columnspan=2, padx=5)
+        self.rotation_entry.bind("<Return>", self.update_object_rotation)
+        
+        ttk.Label(self.property_frame, text="Color:").grid(row=3, column=0, sticky=tk.W, padx=5)
+        self.color_var = tk.StringVar()
+        self.color_optionmenu = ttk.OptionMenu(self.property_frame, self.color_var, None)
+        self.color_optionmenu.grid(row=3, column=1, columnspan=2, padx=5)
+        self.color_choices = None
+        self.refresh_color_menu()
+        ttk.Button(self.property_frame, text="Apply Color", command=self.apply_object_color).grid(row=3, column=3, padx=5)
+        
+        ttk.Label(self.property_frame, text="Groups:").grid(row=4, column=0, sticky=tk.W, padx=5)
+        self.groups_text = tk.Text(self.property_frame, height=4, width=20)
+        self.groups_text.grid(row=4, column=1, columnspan=2, padx=5)
+        self.groups_text.bind("<Return>", self.update_object_groups)
+        
+        ttk.Button(self.property_frame, text="Add Group", command=self.add_group).grid(row=5, column=1, padx=5, pady=5)
+        ttk.Button(self.property_frame, text="Remove Group", command=self.remove_group).grid(row=5, column=2, padx=5, pady=5)
+        
+        ttk.Button(self.property_frame, text="Edit Script", command=self.edit_script).grid(row=6, column=0, columnspan=3, padx=5, pady=5)
+        self.property_frame_shown = False
+    
+    def refresh_color_menu(self):
+        # Only rebuild the menu entries when the palette keys changed.
+        # Channel 1 and every channel that was given a color.
+        choices = tuple(sorted(self.palette.overrides.keys() | {1}))
+        if choices == self.color_choices:
+            return
+        self.color_choices = choices
+        menu = self.color_optionmenu["menu"]
+        menu.delete(0, tk.END)
+        for channel in choices:
+            label = channel_label(channel)
+            menu.add_radiobutton(label=label, variable=self.color_var, value=label)
+    
+    def set_entry(self, entry, value):
+        entry.delete(0, tk.END)
+        entry.insert(0, value)
         
-        if self.selected_object_index != -1 and self.current_scene_index != -1:
-            obj = self.scenes[self.current_scene_index].objects[self.selected_object_index]
-            
-            ttk.Label(self.property_frame, text="Name:").grid(row=0, column=0, sticky=tk.W, padx=5)
-            self.name_entry = ttk.Entry(self.property_frame)
-            self.name_entry.grid(row=0, column=1, padx=5)
-            self.name_entry.insert(0, obj.name)
-            self.name_entry.bind("<Return>", self.update_object_name)
-            
-            ttk.Label(self.property_frame, text="Position:").grid(row=1, column=0, sticky=tk.W, padx=5)
-            self.position_x_entry = ttk.Entry(self.property_frame, width=5)
-            self.position_x_entry.grid(row=1, column=1, padx=5)
-            self.position_x_entry.insert(0, obj.x)
-            self.position_x_entry.bind("<Return>", self.update_object_position)
-            self.position_y_entry = ttk.Entry(self.property_frame, width=5)
-            self.position_y_entry.grid(row=1, column=2, padx=5)
-            self.position_y_entry.insert(0, obj.y)
-            self.position_y_entry.bind("<Return>", self.update_object_position)
-            
-            ttk.Label(self.property_frame, text="Rotation:").grid(row=2, column=0, sticky=tk.W, padx=5)
-            self.rotation_entry = ttk.Entry(self.property_frame, width=10)
-            self.rotation_entry.grid(row=2, column=1, columnspan=2, padx=5)
-            self.rotation_entry.insert(0, obj.rotation)
-            self.rotation_entry.bind("<Return>", self.update_object_rotation)
-            
-            ttk.Label(self.property_frame, text="Color:").grid(row=3, column=0, sticky=tk.W, padx=5)
-            self.color_var = tk.StringVar()
-            self.color_var.set(obj.color_id if obj.color_id else "")
-            self.color_optionmenu = ttk.OptionMenu(self.property_frame, self.color_var, *list(self.project_settings.keys()))
-            self.color_optionmenu.grid(row=3, column=1, columnspan=2, padx=5)
-            ttk.Button(self.property_frame, text="Apply Color", command=self.apply_object_color).grid(row=3, column=3, padx=5)
-            
-            ttk.Label(self.property_frame, text="Groups:").grid(row=4, column=0, sticky=tk.W, padx=5)
-            self.groups_text = tk.Text(self.property_frame, height=4, width=20)
-            self.groups_text.grid(row=4, column=1, columnspan=2, padx=5)
-            self.groups_text.insert(tk.END, "\n".join(obj.groups))
-            self.groups_text.bind("<Return>", self.update_object_groups)
-            
-            ttk.Button(self.property_frame, text="Add Group", command=self.add_group).grid(row=5, column=1, padx=5, pady=5)
-            ttk.Button(self.property_frame, text="Remove Group", command=self.remove_group).grid(row=5, column=2, padx=5, pady=5)
-            
-            ttk.Button(self.property_frame, text="Edit Script", command=self.edit_script).grid(row=6, column=0, columnspan=3, padx=5, pady=5)
+    def update_property_panel(self):
+        if self.selected_object_index == -1 or self.current_scene_index == -1:
+            self.clear_property_text()
+            return
+        obj = self.scenes[self.current_scene_index].objects[self.selected_object_index]
+        
+        self.set_entry(self.name_entry, obj.name)
+        self.set_entry(self.position_x_entry, obj.x)
+        self.set_entry(self.position_y_entry, obj.y)
+        self.set_entry(self.rotation_entry, obj.rotation)
+        channel = channel_id(obj.color_id)
+        self.color_var.set(channel_label(channel) if channel else "")
+        self.groups_text.delete("1.0", tk.END)
+        self.groups_text.insert(tk.END, "\n".join(obj.groups))
+        
+        if not self.property_frame_shown:
+            self.property_frame.pack(expand=True, fill=tk.BOTH)
+            self.property_frame_shown = True
     
     def edit_script(self):
         if self.selected_object_index != -1 and self.current_scene_index != -1:
@@ -294,22 +399,31 @@ class EngineGUI:
     def apply_script_changes(self, script):
         if self.selected_object_index != -1 and self.current_scene_index != -1:
             self.scenes[self.current_scene_index].objects[self.selected_object_index].script = script
+            self.record_set(script=script)
 
     def update_object_name(self, event):
         if self.selected_object_index != -1 and self.current_scene_index != -1:
             new_name = self.name_entry.get().strip()
             if new_name:
-                self.scenes[self.current_scene_index].objects[self.selected_object_index].name = new_name
-                self.update_object_listbox()
+                scene = self.scenes[self.current_scene_index]
+                obj = scene.objects[self.selected_object_index]
+                obj.name = new_name
+                self.record_set(name=new_name)
+                self.object_renamed(scene, self.selected_object_index)
+                self.schedule_redraw(obj)
     
     def update_object_position(self, event):
         if self.selected_object_index != -1 and self.current_scene_index != -1:
             try:
                 new_x = float(self.position_x_entry.get())
                 new_y = float(self.position_y_entry.get())
-                self.scenes[self.current_scene_index].objects[self.selected_object_index].x = new_x
-                self.scenes[self.current_scene_index].objects[self.selected_object_index].y = new_y
-                self.draw_scene()
+                scene = self.scenes[self.current_scene_index]
+                obj = scene.objects[self.selected_object_index]
+                obj.x = new_x
+                obj.y = new_y
+                self.record_set(x=new_x, y=new_y)
+                self.scene_index(scene).move(obj)
+                self.schedule_redraw(obj)
             except ValueError:
                 pass
     
@@ -317,29 +431,40 @@ class EngineGUI:
         if self.selected_object_index != -1 and self.current_scene_index != -1:
             try:
                 new_rotation = float(self.rotation_entry.get())
-                self.scenes[self.current_scene_index].objects[self.selected_object_index].rotation = new_rotation
-                self.draw_scene()
+                obj = self.scenes[self.current_scene_index].objects[self.selected_object_index]
+                obj.rotation = new_rotation
+                self.record_set(rotation=new_rotation)
+                self.schedule_redraw(obj)
             except ValueError:
                 pass
     
     def apply_object_color(self):
         if self.selected_object_index != -1 and self.current_scene_index != -1:
-            color_id = self.color_var.get()
-            if color_id in self.project_settings:
-                self.scenes[self.current_scene_index].objects[self.selected_object_index].color_id = color_id
-                self.draw_scene()
+            channel = channel_id(self.color_var.get())
+            if self.palette.valid(channel):
+                obj = self.scenes[self.current_scene_index].objects[self.selected_object_index]
+                obj.color_id = channel
+                self.record_set(color_id=channel)
+                self.schedule_redraw(obj)
     
     def update_object_groups(self, event):
         if self.selected_object_index != -1 and self.current_scene_index != -1:
             groups_text = self.groups_text.get("1.0", tk.END).strip()
             groups = [group.strip() for group in groups_text.split("\n") if group.strip()]
-            self.scenes[self.current_scene_index].objects[self.selected_object_index].groups = groups
+            scene = self.scenes[self.current_scene_index]
+            scene.objects[self.selected_object_index].groups = groups
+            self.record_set(groups=groups)
+            self.scene_search(scene).groups_changed()
     
     def add_group(self):
         if self.selected_object_index != -1 and self.current_scene_index != -1:
             new_group = simpledialog.askstring("Add Group", "Enter group name:")
             if new_group:
-                self.scenes[self.current_scene_index].objects[self.selected_object_index].groups.append(new_group)
+                scene = self.scenes[self.current_scene_index]
+                obj = scene.objects[self.selected_object_index]
+                obj.groups = obj.groups + [new_group]
+                self.record_set(groups=obj.groups)
+                self.scene_search(scene).groups_changed()
                 self.update_properties_text()
     
     def remove_group(self):
@@ -355,58 +480,154 @@ class EngineGUI:
         scene_name = simpledialog.askstring("New Scene", "Enter scene name:")
         if scene_name:
             self.scenes.append(Scene(scene_name))
+            self.record("add_scene", scene_name)
             self.update_scene_listbox()
             self.update_object_listbox()
 
     
     def delete_scene(self):
         if self.current_scene_index != -1:
-            del self.scenes[self.current_scene_index]
+            scene = self.scenes.pop(self.current_scene_index)
+            self.record("delete_scene", self.current_scene_index)
+            self.spatial_indexes.pop(scene, None)
+            self.search_indexes.pop(scene, None)
             self.current_scene_index = -1
             self.update_scene_listbox()
             self.update_object_listbox()
-            self.draw_scene()
+            self.schedule_redraw()
+    
+    def duplicate_scene(self):
+        if self.current_scene_index != -1:
+            scene = self.scenes[self.current_scene_index]
+            scene_name = simpledialog.askstring("Duplicate Scene", "Enter scene name:", initialvalue=scene.name + " copy")
+            if scene_name:
+                # Shares the objects with the original until one of them is edited.
+                self.scenes.append(scene.duplicate(scene_name))
+                self.record("duplicate_scene", self.current_scene_index, scene_name)
+                self.update_scene_listbox()
     
     def rename_object(self):
         if self.selected_object_index != -1 and self.current_scene_index != -1:
             new_name = simpledialog.askstring("Rename Object", "Enter new object name:")
             if new_name:
-                self.scenes[self.current_scene_index].objects[self.selected_object_index].name = new_name
-                self.update_object_listbox()
-                self.draw_scene()
+                scene = self.scenes[self.current_scene_index]
+                obj = scene.objects[self.selected_object_index]
+                obj.name = new_name
+                self.record_set(name=new_name)
+                self.object_renamed(scene, self.selected_object_index)
+                self.schedule_redraw(obj)
+    
+    def selection(self):
+        # The objects picked on the canvas, or the one selected in the list.
+        if self.current_scene_index == -1:
+            return []
+        if self.selected_objects:
+            return list(self.selected_objects)
+        if self.selected_object_index != -1:
+            return [self.scenes[self.current_scene_index].objects[self.selected_object_index]]
+        return []
+    
+    def transform_selection(self, operation):
+        objects = self.selection()
+        if not objects:
+            return
+        transform = BulkTransform(objects)
+        operation(transform)
+        transform.apply()
+        scene = self.scenes[self.current_scene_index]
+        self.record("transform", self.current_scene_index, object_indexes(scene.objects, objects),
+                    transform.x, transform.y, transform.rotation, transform.scale)
+        self.scene_index(scene).move_many(objects, transform.x, transform.y)
+        if len(objects) > 1:
+            self.schedule_redraw()
+        else:
+            self.schedule_redraw(objects[0])
+        if self.selected_object_index != -1:
+            self.update_properties_text()
     
-    def move_object(self, event):
-        if self.selected_object_index != -1 and self.current_scene_index != -1:
-            obj = self.scenes[self.current_scene_index].objects[self.selected_object_index]
-            x = event.x
-            y = event.y
-            obj.x = x
-            obj.y = y
-            self.draw_scene()
+    def ask_offset(self, title):
+        text = simpledialog.askstring(title, "Enter the offset as x, y:")
+        if text:
+            try:
+                dx, dy = (float(value) for value in text.split(","))
+                return dx, dy
+            except ValueError:
+                messagebox.showerror(title, "The offset must be two numbers separated by a comma.")
+        return None
+    
+    def move_selection(self):
+        offset = self.ask_offset("Move")
+        if offset:
+            self.transform_selection(lambda t: t.translate(*offset))
+    
+    def rotate_selection(self):
+        angle = simpledialog.askfloat("Rotate", "Enter the angle in degrees:")
+        if angle:
+            self.transform_selection(lambda t: t.rotate(angle))
+    
+    def scale_selection(self):
+        factor = simpledialog.askfloat("Scale", "Enter the scale factor:", minvalue=0.01)
+        if factor:
+            self.transform_selection(lambda t: t.scale_by(factor))
+    
+    def instance_selection(self):
+        # Stamps the selection several times, each copy one more offset away.
+        if self.selection():
+            count = simpledialog.askinteger("Instance", "Enter the number of copies:", minvalue=1)
+            if count:
+                self.duplicate_selection(count, "Instance")
+    
+    def duplicate_selection(self, count=1, title="Duplicate"):
+        objects = self.selection()
+        if not objects:
+            return
+        offset = self.ask_offset(title)
+        if offset is None:
+            return
+        scene = self.scenes[self.current_scene_index]
+        # Keep the copies in the same order as the originals in the scene.
+        order = {obj: i for i, obj in enumerate(scene.objects)} if len(objects) > 1 else {}
+        objects.sort(key=lambda obj: order.get(obj, 0))
+        # The copies share names, groups and scripts with the originals.
+        copies = scene.objects.instance(objects, *offset, count)
+        self.record("add", self.current_scene_index, object_values(copies))
+        index = self.scene_index(scene)
+        search = self.scene_search(scene)
+        for obj in copies:
+            index.insert(obj)
+            search.add(obj)
+        self.update_object_listbox()
+        self.selected_object_index = -1
+        self.clear_property_text()
+        self.set_selected_objects(copies)
+        self.schedule_redraw()
     
     def open_project_settings(self):
-        ProjectSettingsPopup(self.root, self.project_settings, self.apply_project_settings)
+        ProjectSettingsPopup(self.root, self.palette, self.apply_project_settings)
     
-    def apply_project_settings(self, settings):
-        self.project_settings = settings
+    def apply_project_settings(self, palette):
+        self.palette = palette
+        self.refresh_color_menu()
+        self.schedule_redraw()
     
     def select_scene(self, event):
         selection = self.scene_listbox.curselection()
+        self.selected_objects = set()
         if selection:
             self.current_scene_index = selection[0]
             self.update_object_listbox()
             self.clear_property_text()
-            self.draw_scene()
+            self.schedule_redraw()
         else:
             self.current_scene_index = -1
             self.clear_object_listbox()
             self.clear_property_text()
-            self.draw_scene()
+            self.schedule_redraw()
     
     def select_object(self, event):
-        selection = self.object_listbox.curselection()
+        selection = self.object_list.curselection()
         if selection:
-            self.selected_object_index = selection[0]
+            self.selected_object_index = self.row_object_index(selection[0])
             self.update_properties_text()
         else:
             self.selected_object_index = -1
@@ -415,78 +636,328 @@ class EngineGUI:
     def create_canvas(self):
         self.canvas = tk.Canvas(self.root, bg="#333333")
         self.canvas.pack(expand=True, fill=tk.BOTH)
-        self.canvas.bind("<Button-1>", self.select_object)
-        self.canvas.bind("<B1-Motion>", self.move_object)
+        self.canvas.bind("<Button-1>", self.canvas_press)
+        self.canvas.bind("<B1-Motion>", self.canvas_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.canvas_release)
+        self.canvas.bind("<Button-2>", self.pan_press)
+        self.canvas.bind("<B2-Motion>", self.pan_drag)
+        self.canvas.bind("<MouseWheel>", self.zoom_wheel)
+        self.canvas.bind("<Button-4>", self.zoom_wheel)
+        self.canvas.bind("<Button-5>", self.zoom_wheel)
+        self.canvas.bind("<Configure>", lambda event: self.schedule_redraw())
+    
+    def pan_press(self, event):
+        self.pan_start = (event.x, event.y)
+    
+    def pan_drag(self, event):
+        if self.pan_start is not None:
+            self.camera.pan(event.x - self.pan_start[0], event.y - self.pan_start[1])
+            self.pan_start = (event.x, event.y)
+            self.schedule_redraw()
+    
+    def zoom_wheel(self, event):
+        zoom_in = getattr(event, "delta", 0) > 0 or getattr(event, "num", None) == 4
+        self.camera.zoom_at(ZOOM_STEP if zoom_in else 1 / ZOOM_STEP, event.x, event.y)
+        self.schedule_redraw()
+    
+    def scene_index(self, scene):
+        index = self.spatial_indexes.get(scene)
+        if index is None:
+            index = SpatialGrid()
+            index.build(scene.objects)
+            self.spatial_indexes[scene] = index
+        return index
+    
+    def canvas_press(self, event):
+        # Clicking an object (or close to one) picks it for dragging, clicking
+        # empty space starts a rubber band selection.
+        self.drag_object = None
+        if self.current_scene_index == -1:
+            return
+        index = self.scene_index(self.scenes[self.current_scene_index])
+        x, y = self.camera.to_world(event.x, event.y)
+        obj = index.query_point(x, y) or index.nearest(x, y, PICK_DISTANCE / self.camera.zoom)
+        if obj is not None:
+            self.drag_object = obj
+            self.select_canvas_object(obj)
+        else:
+            band = self.canvas.create_rectangle(event.x, event.y, event.x, event.y, outline=SELECTION_OUTLINE, dash=(4, 2))
+            self.rubber_band = (event.x, event.y, band)
+    
+    def canvas_drag(self, event):
+        if self.drag_object is not None:
+            obj = self.drag_object
+            obj.x, obj.y = self.camera.to_world(event.x, event.y)
+            self.record_set(x=obj.x, y=obj.y)
+            self.scene_index(self.scenes[self.current_scene_index]).move(obj)
+            self.schedule_redraw(obj)
+        elif self.rubber_band is not None:
+            x, y, band = self.rubber_band
+            self.canvas.coords(band, x, y, event.x, event.y)
+    
+    def canvas_release(self, event):
+        self.drag_object = None
+        if self.rubber_band is None:
+            return
+        x, y, band = self.rubber_band
+        self.canvas.delete(band)
+        self.rubber_band = None
+        objects = self.scene_index(self.scenes[self.current_scene_index]).query_rect(
+            *self.camera.to_world(x, y), *self.camera.to_world(event.x, event.y))
+        if len(objects) == 1:
+            self.select_canvas_object(objects[0])
+        else:
+            self.set_selected_objects(objects)
+    
+    def select_canvas_object(self, obj):
+        self.selected_object_index = self.scenes[self.current_scene_index].objects.index(obj)
+        row = self.object_row(self.selected_object_index)
+        if row is None:
+            self.object_list.clear_selection()
+        else:
+            self.object_list.select(row)
+        self.set_selected_objects([obj])
+        self.update_properties_text()
+    
+    def set_selected_objects(self, objects):
+        for obj in self.selected_objects:
+            items = self.canvas_items.get(obj)
+            if items is not None:
+                self.canvas.itemconfig(items[0], outline="#000000", width=1)
+        self.selected_objects = set(objects)
+        for obj in self.selected_objects:
+            items = self.canvas_items.get(obj)
+            if items is not None:
+                self.canvas.itemconfig(items[0], outline=SELECTION_OUTLINE, width=2)
+    
+    def schedule_redraw(self, obj=None):
+        # Marks obj (or the whole view when obj is None) as changed. However
+        # many edits come in, they are drawn together once per frame.
+        if obj is None:
+            self.full_redraw = True
+        else:
+            self.dirty_objects.add(obj)
+        if self.redraw_job is None:
+            elapsed_ms = (time.perf_counter() - self.last_redraw) * 1000
+            delay = max(0, int(FRAME_INTERVAL_MS - elapsed_ms))
+            if delay:
+                self.redraw_job = self.root.after(delay, self.flush_redraw)
+            else:
+                self.redraw_job = self.root.after_idle(self.flush_redraw)
+    
+    def flush_redraw(self):
+        self.redraw_job = None
+        self.last_redraw = time.perf_counter()
+        dirty_objects = self.dirty_objects
+        self.dirty_objects = set()
+        if self.full_redraw:
+            self.full_redraw = False
+            self.draw_scene()
+        else:
+            for obj in dirty_objects:
+                self.update_object_items(obj)
     
     def draw_scene(self):
+        # Rebuilds the canvas, but only for the objects inside the camera
+        # view, so the cost follows what is on screen and not the scene size.
+        # Edits to a single object go through update_object_items.
         self.canvas.delete("all")
+        self.canvas_items = {}
         if self.current_scene_index != -1:
             scene = self.scenes[self.current_scene_index]
-            for obj in scene.objects:
-                x, y = obj.get_position()
-                self.canvas.create_rectangle(x - 10, y - 10, x + 10, y + 10, fill=self.project_settings.get(obj.color_id, "#FFFFFF"))
-                self.canvas.create_text(x, y, text=str(obj.name), fill="#000000")
-                if obj.rotation != 0:
-                    self.canvas.create_line(x, y, x + 20 * cos(radians(obj.rotation)), y + 20 * sin(radians(obj.rotation)), fill="#FF0000")
+            for obj in self.scene_index(scene).query_rect(*self.visible_rect()):
+                self.create_object_items(obj)
+    
+    def visible_rect(self):
+        return self.camera.visible_rect(self.canvas.winfo_width(), self.canvas.winfo_height())
+    
+    def is_visible(self, obj):
+        x0, y0, x1, y1 = self.visible_rect()
+        return x0 - 10 <= obj.x <= x1 + 10 and y0 - 10 <= obj.y <= y1 + 10
+    
+    def object_coords(self, obj):
+        x, y = self.camera.to_screen(*obj.get_position())
+        half = 10 * self.camera.zoom
+        return x - half, y - half, x + half, y + half
+    
+    def rotation_line_coords(self, obj):
+        x, y = self.camera.to_screen(*obj.get_position())
+        length = 20 * self.camera.zoom
+        return x, y, x + length * cos(radians(obj.rotation)), y + length * sin(radians(obj.rotation))
+    
+    def create_object_items(self, obj):
+        rect = self.canvas.create_rectangle(*self.object_coords(obj), fill=self.palette.fill(obj.color_id))
+        if obj in self.selected_objects:
+            self.canvas.itemconfig(rect, outline=SELECTION_OUTLINE, width=2)
+        text = None
+        line = None
+        if self.camera.zoom >= DETAIL_ZOOM:
+            text = self.canvas.create_text(*self.camera.to_screen(*obj.get_position()), text=str(obj.name), fill="#000000")
+            if obj.rotation != 0:
+                line = self.canvas.create_line(*self.rotation_line_coords(obj), fill="#FF0000")
+        self.canvas_items[obj] = (rect, text, line)
+    
+    def update_object_items(self, obj):
+        items = self.canvas_items.get(obj)
+        if items is None:
+            # Objects outside the view have no items until they move into it.
+            if self.current_scene_index != -1 and self.is_visible(obj):
+                self.create_object_items(obj)
+            return
+        rect, text, line = items
+        self.canvas.coords(rect, *self.object_coords(obj))
+        self.canvas.itemconfig(rect, fill=self.palette.fill(obj.color_id))
+        if text is not None:
+            self.canvas.coords(text, *self.camera.to_screen(*obj.get_position()))
+            self.canvas.itemconfig(text, text=str(obj.name))
+        if obj.rotation != 0 and self.camera.zoom >= DETAIL_ZOOM:
+            if line is None:
+                line = self.canvas.create_line(*self.rotation_line_coords(obj), fill="#FF0000")
+            else:
+                self.canvas.coords(line, *self.rotation_line_coords(obj))
+        elif line is not None:
+            self.canvas.delete(line)
+            line = None
+        self.canvas_items[obj] = (rect, text, line)
     
     def update_scene_listbox(self):
         self.scene_listbox.delete(0, tk.END)
         for scene in self.scenes:
             self.scene_listbox.insert(tk.END, scene.name)
     
+    def scene_search(self, scene):
+        search = self.search_indexes.get(scene)
+        if search is None:
+            search = ObjectSearch(scene.objects)
+            self.search_indexes[scene] = search
+        return search
+    
+    def object_row_count(self):
+        if self.current_scene_index == -1:
+            return 0
+        if self.object_rows is not None:
+            return len(self.object_rows)
+        return len(self.scenes[self.current_scene_index].objects)
+    
+    def object_row_text(self, row):
+        return self.scenes[self.current_scene_index].objects[self.row_object_index(row)].name
+    
+    def row_object_index(self, row):
+        return row if self.object_rows is None else self.object_rows[row]
+    
+    def object_row(self, index):
+        if self.object_rows is None:
+            return index
+        try:
+            return self.object_rows.index(index)
+        except ValueError:
+            return None
+    
+    def object_renamed(self, scene, index):
+        # Only the renamed row is redrawn, the filter is applied again on the
+        # next search or scene switch.
+        self.scene_search(scene).rename(index)
+        row = self.object_row(index)
+        if row is not None:
+            self.object_list.refresh_row(row)
+    
     def update_object_listbox(self):
-        self.object_listbox.delete(0, tk.END)
+        # Filters the current scene and refills the visible rows of the list.
+        self.object_rows = None
         if self.current_scene_index != -1:
             scene = self.scenes[self.current_scene_index]
-            for obj in scene.objects:
-                self.object_listbox.insert(tk.END, obj.name)
+            self.object_rows = self.scene_search(scene).search(self.object_filter.get())
+        self.object_list.clear_selection()
+        self.object_list.refresh()
     
     def clear_object_listbox(self):
-        self.object_listbox.delete(0, tk.END)
+        self.object_rows = None
+        self.object_list.clear_selection()
+        self.object_list.refresh()
     
     def update_properties_text(self):
         self.update_property_panel()
     
     def clear_property_text(self):
-        for widget in self.property_frame.winfo_children():
-            widget.destroy()
+        if self.property_frame_shown:
+            self.property_frame.pack_forget()
+            self.property_frame_shown = False
     
     def save_project(self):
-        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
+        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=PROJECT_FILETYPES)
         if filename:
-            data = {
-                "scenesNumber": scenesNumber,
-                "scenes": [scene.to_dict() for scene in self.scenes]
-                }
-            with open(filename, "w") as f:
-                json.dump(data, f, indent=4)
+            # Written by the journal thread from a copy of the scenes.
+            self.journal.save(self.scenes, filename)
     
     def load_project(self):
-        filename = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
+        filename = filedialog.askopenfilename(filetypes=PROJECT_FILETYPES)
         if filename:
-            with open(filename, "r") as f:
-                data = json.load(f)
-                scenesNumber = data["scenesNumber"]
-                self.scenes = [Scene.from_dict(scene_data) for scene_data in data["scenes"]]
-                self.update_scene_listbox()
-                self.current_scene_index = -1
-                self.update_object_listbox()
-                self.clear_property_text()
-                self.draw_scene()
+            try:
+                if not projectfile.is_binary_project(filename):
+                    # JSON projects are streamed in while the editor keeps running.
+                    ImportPopup(self.root, filename, self.set_project)
+                    return
+                # Binary projects only decode a scene when it is selected.
+                scenes = projectfile.open_binary_project(filename)
+            except (OSError, projectfile.ProjectFileError) as e:
+                messagebox.showerror("Load Project", str(e))
+                return
+            self.set_project(scenes, filename)
+    
+    def set_project(self, scenes, filename):
+        self.scenes = scenes
+        # The autosave starts from the opened file, not from a copy of it.
+        self.journal.start(self.scenes, filename)
+        self.spatial_indexes = {}
+        self.search_indexes = {}
+        self.selected_objects = set()
+        self.update_scene_listbox()
+        self.current_scene_index = -1
+        self.update_object_listbox()
+        self.clear_property_text()
+        self.schedule_redraw()
 
     def add_object(self):
         if self.current_scene_index != -1:
             obj_id = 1
             new_object = GameObject(obj_id,32,32,0,None,[],"object","")
-            self.scenes[self.current_scene_index].objects.append(new_object)
+            scene = self.scenes[self.current_scene_index]
+            scene.objects.append(new_object)
+            self.record("add", self.current_scene_index, object_values([new_object]))
+            self.scene_index(scene).insert(new_object)
+            self.scene_search(scene).add(new_object)
+            if self.object_rows is None:
+                self.object_list.refresh_row(len(scene.objects) - 1)
+            else:
+                self.update_object_listbox()
+            self.clear_property_text()
+            self.schedule_redraw(new_object)
+
+    def delete_object(self):
+        if self.selected_object_index != -1 and self.current_scene_index != -1:
+            scene = self.scenes[self.current_scene_index]
+            obj = scene.objects.pop(self.selected_object_index)
+            self.record("delete", self.current_scene_index, self.selected_object_index)
+            self.scene_index(scene).remove(obj)
+            self.scene_search(scene).remove(self.selected_object_index)
+            self.selected_objects.discard(obj)
+            self.dirty_objects.discard(obj)
+            for item in self.canvas_items.pop(obj, ()):
+                if item is not None:
+                    self.canvas.delete(item)
+            self.selected_object_index = -1
             self.update_object_listbox()
             self.clear_property_text()
-            self.draw_scene()
 
     def compile_project(self):
         game_name = simpledialog.askstring("Compile", "Whats the name of the lvl in gd you want to replace with the compiled game?")
         if game_name:
-            compile.compile_spwn(self.scenes,"PROJ_" + game_name + ".compiled.spwn",game_name)
+            try:
+                compile.compile_spwn(self.scenes,"PROJ_" + game_name + ".compiled.spwn",game_name,workers=None)
+            except BudgetError as e:
+                messagebox.showerror("Compile", "The level is too heavy for Geometry Dash:\n" + "\n".join(e.report.errors))
+            except ScriptError as e:
+                messagebox.showerror("Compile", str(e))
             
     def run(self):
         self.root.mainloop()
@@ -0,0 +1,198 @@
+"""
+Streaming import of JSON projects. json.load would parse the whole file into
+dicts before a single object reaches the scene; here the file is read a chunk
+at a time and every object goes into its scene's columns as soon as it is
+parsed, so memory stays at about the size of the imported scenes plus one
+chunk, whatever the size of the file.
+
+    project = ProjectImport("huge.json")
+    while not project.step():
+        print(project.progress())
+    scenes = project.scenes
+
+step() parses a bounded number of objects, the editor runs one step per
+event loop turn to keep drawing and to let the user cancel.
+"""
+
+import codecs
+import json
+import os
+import re
+from itertools import islice
+
+from engine.scene import Scene
+
+CHUNK_SIZE = 1 << 20
+# Objects parsed per step.
+STEP_OBJECTS = 5000
+# Anything but the objects list is decoded whole, a single value bigger than
+# this means the file is broken or not a project.
+MAX_VALUE_SIZE = 64 << 20
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+class ProjectImportError(Exception):
+    pass
+
+class JsonStream:
+    # Just enough of a pull parser for the project file: objects and arrays
+    # are walked member by member, other values are decoded whole with the
+    # json module.
+    def __init__(self, file):
+        self.file = file
+        self.decoder = json.JSONDecoder()
+        self.text = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.file.read(CHUNK_SIZE)
+        self.bytes_read += len(chunk)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos:] + self.text.decode(chunk, final=self.eof)
+        self.pos = 0
+        if len(self.buffer) > MAX_VALUE_SIZE:
+            raise ProjectImportError(f"a value bigger than {MAX_VALUE_SIZE >> 20} MB at byte {self.bytes_read - len(self.buffer)}")
+        return not self.eof
+
+    def peek(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ProjectImportError("the file ends in the middle of the project")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ProjectImportError(f"expected {char!r} but found {self.buffer[self.pos]!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if not self.fill():
+                    raise ProjectImportError(str(e)) from None
+                continue
+            # A number that runs up to the end of the buffer may go on in
+            # the next chunk.
+            if end < len(self.buffer) or self.eof:
+                self.pos = end
+                return value
+            self.fill()
+
+    def members(self):
+        # Yields the keys of an object, the caller reads each value.
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ProjectImportError(f"expected a key but found {key!r}")
+            self.expect(":")
+            yield key
+            if self.peek() == "}":
+                self.pos += 1
+                return
+            self.expect(",")
+
+    def items(self):
+        # Yields once per element of an array, the caller reads it.
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            self.expect(",")
+
+class ProjectImport:
+    def __init__(self, filename):
+        self.filename = filename
+        self.size = os.path.getsize(filename)
+        self.file = open(filename, "rb")
+        self.stream = JsonStream(self.file)
+        self.scenes = []
+        self.objects = 0
+        self.done = False
+        self.cancelled = False
+        self.parser = self.parse()
+
+    def parse(self):
+        # Same schema as Scene.from_dict, keys in any order.
+        stream = self.stream
+        for key in stream.members():
+            if key != "scenes":
+                stream.value()
+                continue
+            for _ in stream.items():
+                scene = Scene("")
+                self.scenes.append(scene)
+                for scene_key in stream.members():
+                    if scene_key == "objects":
+                        for _ in stream.items():
+                            scene.objects.add_dict(stream.value())
+                            self.objects += 1
+                            yield
+                    elif scene_key == "name":
+                        scene.name = stream.value()
+                    else:
+                        stream.value()
+
+    def step(self, count=STEP_OBJECTS):
+        # Parses up to count objects, True once the whole file is read.
+        if self.cancelled:
+            raise ProjectImportError("the import was cancelled")
+        if self.done:
+            return True
+        try:
+            parsed = sum(1 for _ in islice(self.parser, count))
+        except (ProjectImportError, OSError):
+            self.close()
+            raise
+        except UnicodeDecodeError as e:
+            self.close()
+            raise ProjectImportError(f"the file is not UTF-8 text: {e}") from None
+        except Exception as e:
+            # A missing key, or a value that does not fit its column like an
+            # obj_id too big for it.
+            self.close()
+            raise ProjectImportError(f"object {self.objects + 1} is not a valid object: {e!r}") from None
+        if parsed < count:
+            self.done = True
+            self.close()
+        return self.done
+
+    def progress(self):
+        # Fraction of the file read so far.
+        if self.done or not self.size:
+            return 1.0
+        return self.stream.bytes_read / self.size
+
+    def cancel(self):
+        self.cancelled = True
+        self.scenes = []
+        self.close()
+
+    def close(self):
+        self.parser.close()
+        self.file.close()
+
+def import_project(filename, progress=None):
+    # Reads the whole project, calling progress(fraction) after every step.
+    project = ProjectImport(filename)
+    while not project.step():
+        if progress is not None:
+            progress(project.progress())
+    return project.scenes
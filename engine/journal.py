@@ -0,0 +1,293 @@
+"""
+Autosave for the editor. Every edit is appended to a journal file by a
+background thread, and every so often the whole project is written as a
+binary snapshot (see projectfile) after which the journal starts over. When
+the editor crashes, the last snapshot is opened and its journal replayed.
+
+The folder holds autosave-<n>.gdproj and the journal of the edits made
+after it, autosave-<n>.journal. A generation that starts from a project file
+just opened or saved holds autosave-<n>.base instead of the snapshot, the
+path of that file with its size and modification time, so opening a project
+neither decodes nor writes it again. The journal has one JSON list per line:
+
+    ["add_scene", name]
+    ["delete_scene", scene]
+    ["duplicate_scene", scene, name]
+    ["add", scene, [[obj_id, x, y, rotation, color_id, groups, name, script, scale], ...]]
+    ["delete", scene, index]
+    ["set", scene, index, {field: value, ...}]
+    ["transform", scene, [index, ...], [x, ...], [y, ...], [rotation, ...], [scale, ...]]
+
+scene is the position of the scene in the project and index the position of
+the object in the scene, at the time of the edit. Like any opened project
+the recovered scenes are numbered again.
+
+For a snapshot the editor thread only takes copy-on-write copies of the
+scenes (see Scene.snapshot), the encoding and writing happens on the journal
+thread, so neither autosaving nor saving the project blocks the UI.
+"""
+
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from engine import projectfile
+from engine.scene import ObjectList, Scene
+
+AUTOSAVE_FOLDER = "autosave"
+# A snapshot is taken once the journal holds this many edits, or after
+# SNAPSHOT_INTERVAL seconds with any edit at all.
+COMPACT_AFTER = 20000
+SNAPSHOT_INTERVAL = 300
+BASE = ".base"
+
+def object_indexes(objects, selection):
+    # Positions of the selected objects in the scene, found with one sorted
+    # search instead of an ObjectList.index per object.
+    if not isinstance(objects, ObjectList):
+        positions = {obj: index for index, obj in enumerate(objects)}
+        return [positions[obj] for obj in selection]
+    order = np.frombuffer(objects.order, dtype=np.int64)
+    rows = np.fromiter((obj.row for obj in selection), np.int64, len(selection))
+    sorter = np.argsort(order, kind="stable")
+    return sorter[np.searchsorted(order, rows, sorter=sorter)].tolist()
+
+def object_values(objects):
+    return [[obj_id, x, y, rotation, color_id, list(groups), name, script, scale]
+            for obj_id, x, y, rotation, color_id, groups, name, script, scale
+            in (obj.record() for obj in objects)]
+
+def apply_edit(scenes, edit):
+    op = edit[0]
+    if op == "add_scene":
+        scenes.append(Scene(edit[1]))
+    elif op == "delete_scene":
+        del scenes[edit[1]]
+    elif op == "duplicate_scene":
+        scenes.append(scenes[edit[1]].duplicate(edit[2]))
+    elif op == "add":
+        objects = scenes[edit[1]].objects
+        for values in edit[2]:
+            objects.add(*values)
+    elif op == "delete":
+        del scenes[edit[1]].objects[edit[2]]
+    elif op == "set":
+        obj = scenes[edit[1]].objects[edit[2]]
+        for field, value in edit[3].items():
+            setattr(obj, field, value)
+    elif op == "transform":
+        objects = scenes[edit[1]].objects
+        for index, x, y, rotation, scale in zip(*edit[2:]):
+            obj = objects[index]
+            obj.x = x
+            obj.y = y
+            obj.rotation = rotation
+            obj.scale = scale
+    else:
+        raise ValueError(f"unknown journal entry {op!r}")
+
+def write_base(filename, path):
+    stat = os.stat(filename)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"path": os.path.abspath(filename), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}, f)
+    os.replace(tmp_path, path)
+
+def open_base(path):
+    # The project a generation started from, as long as the file is still
+    # the one the journal was recorded against.
+    with open(path, "r") as f:
+        base = json.load(f)
+    stat = os.stat(base["path"])
+    if (stat.st_size, stat.st_mtime_ns) != (base["size"], base["mtime_ns"]):
+        raise projectfile.ProjectFileError(f"{base['path']} changed after it was opened, the autosaved edits can't be applied to it")
+    return projectfile.open_project(base["path"])
+
+def read_journal(filename):
+    edits = []
+    with open(filename, "r") as f:
+        for line in f:
+            try:
+                edits.append(json.loads(line))
+            except ValueError:
+                # The line being written when the editor died.
+                break
+    return edits
+
+class Journal:
+    def __init__(self, folder=AUTOSAVE_FOLDER, compact_after=COMPACT_AFTER, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.folder = folder
+        self.compact_after = compact_after
+        self.snapshot_interval = snapshot_interval
+        self.generation = 0
+        self.edits = 0
+        self.last_snapshot = time.monotonic()
+        self.queue = queue.Queue()
+        self.errors = []
+        self.file = None
+        self.thread = None
+
+    def path(self, generation, extension):
+        return os.path.join(self.folder, f"autosave-{generation}{extension}")
+
+    def generations(self):
+        found = set()
+        for extension in (projectfile.EXTENSION, BASE):
+            for path in glob.glob(os.path.join(self.folder, "autosave-*" + extension)):
+                number = os.path.basename(path)[len("autosave-"):-len(extension)]
+                if number.isdigit():
+                    found.add(int(number))
+        return sorted(found)
+
+    def recover(self):
+        # The project as it was when the editor last stopped without closing
+        # the journal, or None when there is nothing to recover.
+        generations = self.generations()
+        if not generations:
+            return None
+        generation = generations[-1]
+        base = self.path(generation, BASE)
+        if os.path.exists(base):
+            scenes = open_base(base)
+        else:
+            scenes = projectfile.open_binary_project(self.path(generation, projectfile.EXTENSION))
+        journal = self.path(generation, ".journal")
+        if os.path.exists(journal):
+            for edit in read_journal(journal):
+                apply_edit(scenes, edit)
+        return scenes
+
+    def start(self, scenes, base=None):
+        # Starts over from scenes, an opened project or the recovered one.
+        # base is the file the scenes were just opened from, the first
+        # generation refers to it instead of holding a copy of the project.
+        if self.thread is None:
+            # Numbered after whatever an earlier session left behind, so the
+            # newest snapshot is always the one with the highest number.
+            self.generation = max(self.generations(), default=0)
+            self.thread = threading.Thread(target=self.run, name="journal", daemon=True)
+            self.thread.start()
+        if base is None:
+            self.compact(scenes)
+        else:
+            self.queue.put(("base", self.next_generation(), base))
+
+    def record(self, *edit):
+        if self.thread is not None:
+            self.queue.put(("edit", edit))
+            self.edits += 1
+
+    def needs_snapshot(self):
+        if self.edits >= self.compact_after:
+            return True
+        return self.edits > 0 and time.monotonic() - self.last_snapshot >= self.snapshot_interval
+
+    def next_generation(self):
+        self.generation += 1
+        self.edits = 0
+        self.last_snapshot = time.monotonic()
+        return self.generation
+
+    def compact(self, scenes):
+        self.queue.put(("snapshot", self.next_generation(), [scene.snapshot() for scene in scenes]))
+
+    def save(self, scenes, filename):
+        # The saved file holds every edit so far, a new generation starts
+        # from it.
+        self.queue.put(("save", self.next_generation(), filename, [scene.snapshot() for scene in scenes]))
+
+    def take_errors(self):
+        errors, self.errors = self.errors, []
+        return errors
+
+    def close(self):
+        # Clean shutdown: waits for pending saves and removes the autosave.
+        if self.thread is None:
+            return
+        self.queue.put(("stop",))
+        self.thread.join()
+        self.thread = None
+        for generation in self.generations():
+            self.remove(generation)
+
+    def remove(self, generation):
+        # A recovered snapshot may still be mapped by its unread scenes.
+        projectfile.release_file(self.path(generation, projectfile.EXTENSION))
+        for extension in (projectfile.EXTENSION, BASE, ".journal"):
+            try:
+                os.remove(self.path(generation, extension))
+            except FileNotFoundError:
+                pass
+
+    def run(self):
+        while True:
+            # Everything queued so far is written with a single flush.
+            items = [self.queue.get()]
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in items:
+                if item[0] == "stop":
+                    self.close_file()
+                    return
+                try:
+                    self.handle(item)
+                except Exception as e:
+                    self.errors.append(e)
+            if self.file is not None:
+                self.file.flush()
+
+    def handle(self, item):
+        kind = item[0]
+        if kind == "edit":
+            if self.file is not None:
+                self.file.write(json.dumps(item[1], separators=(",", ":"), default=_json_default) + "\n")
+        elif kind == "snapshot":
+            _, generation, scenes = item
+            self.begin(generation, scenes=scenes)
+        elif kind == "base":
+            _, generation, filename = item
+            self.begin(generation, base=filename)
+        elif kind == "save":
+            _, generation, filename, scenes = item
+            try:
+                projectfile.save_any_project(scenes, filename)
+            except Exception:
+                # Nothing to refer to, the generation holds its own copy.
+                self.begin(generation, scenes=scenes)
+                raise
+            self.begin(generation, base=filename)
+
+    def begin(self, generation, scenes=None, base=None):
+        # Starts a generation from a snapshot of scenes or from the project
+        # file base.
+        os.makedirs(self.folder, exist_ok=True)
+        self.close_file()
+        if base is None:
+            projectfile.write_binary_project(scenes, self.path(generation, projectfile.EXTENSION))
+        else:
+            write_base(base, self.path(generation, BASE))
+        # Only once the new generation is complete are the older ones and
+        # their journals dropped.
+        self.file = open(self.path(generation, ".journal"), "w")
+        for old in self.generations():
+            if old != generation:
+                self.remove(old)
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def _json_default(value):
+    # numpy arrays of a bulk transform.
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} can't go in the journal")
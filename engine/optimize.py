@@ -0,0 +1,150 @@
+"""
+Optimization passes run on the scenes before any code is emitted. Every pass
+takes a list of objects and returns the objects to keep, the scenes given to
+optimize_scenes are never modified.
+
+    dedupe  removes objects identical to an earlier one
+    merge   turns 2x2 squares of the same uniform block into one block
+            scaled twice, repeated while squares are found
+    cull    removes objects that lie entirely inside an identical looking,
+            bigger object
+
+merge and cull work on the grid, they leave blocks that are not rotated by a
+multiple of 90 degrees alone.
+"""
+
+import copy
+
+from engine.scene import GameObject, ObjectList, object_records
+
+BLOCK_SIZE = 30
+# Blocks that look the same at any scale, merging a block with an outline
+# would change how the level looks.
+MERGEABLE_IDS = {211}
+PASSES = ("dedupe", "merge", "cull")
+# Object fields the passes look at.
+PASS_FIELDS = ("obj_id", "x", "y", "rotation", "color_id", "groups", "script", "scale")
+
+def axis_aligned(rotation):
+    # A square block turned by a multiple of 90 degrees covers the same area.
+    return rotation % 90 == 0
+
+def kept_objects(objects, kept):
+    # Keeps the result of a pass columnar when the scene was.
+    if isinstance(objects, ObjectList):
+        return objects.shared(kept)
+    return kept
+
+def dedupe(objects):
+    seen = set()
+    kept = []
+    for obj, (obj_id, x, y, rotation, color_id, groups, script, scale) in zip(objects, object_records(objects, PASS_FIELDS)):
+        # Two copies of a scripted object run the script twice, keep them.
+        if script:
+            kept.append(obj)
+            continue
+        key = (obj_id, x, y, rotation, color_id, groups, scale)
+        if key not in seen:
+            seen.add(key)
+            kept.append(obj)
+    return kept_objects(objects, kept)
+
+def merge_squares(objects):
+    positions = {}
+    for obj, (obj_id, x, y, rotation, color_id, groups, script, scale) in zip(objects, object_records(objects, PASS_FIELDS)):
+        if obj_id in MERGEABLE_IDS and not script and axis_aligned(rotation):
+            key = ((obj_id, rotation, color_id), groups, scale)
+            positions[(key, x, y)] = obj
+
+    merged = []
+    used = set()
+    for (key, x, y), obj in sorted(positions.items(), key=lambda item: (item[0][1], item[0][2])):
+        if obj in used:
+            continue
+        (obj_id, rotation, color_id), groups, scale = key
+        step = BLOCK_SIZE * scale
+        square = [positions.get((key, x + dx, y + dy)) for dx, dy in ((0, 0), (step, 0), (0, step), (step, step))]
+        if all(other is not None and other not in used for other in square):
+            used.update(square)
+            merged.append(GameObject(
+                obj_id=obj_id,
+                x=x + step / 2,
+                y=y + step / 2,
+                rotation=rotation,
+                color_id=color_id,
+                groups=list(groups),
+                name=obj.name,
+                scale=scale * 2
+            ))
+    if not merged:
+        return objects
+    return [obj for obj in objects if obj not in used] + merged
+
+def merge(objects):
+    while True:
+        result = merge_squares(objects)
+        if result is objects:
+            return result
+        objects = result
+
+def covers(big, small):
+    reach = BLOCK_SIZE * (big.scale - small.scale) / 2
+    return abs(big.x - small.x) <= reach and abs(big.y - small.y) <= reach and set(small.groups) <= set(big.groups)
+
+def cull(objects):
+    # Bigger objects are put in every grid cell they overlap, so each object
+    # only has to be checked against the few that share its cell.
+    cells = {}
+    for obj, (obj_id, x, y, rotation, color_id, groups, script, scale) in zip(objects, object_records(objects, PASS_FIELDS)):
+        if scale > 1 and axis_aligned(rotation):
+            half = BLOCK_SIZE * scale / 2
+            for cx in range(int((x - half) // BLOCK_SIZE), int((x + half) // BLOCK_SIZE) + 1):
+                for cy in range(int((y - half) // BLOCK_SIZE), int((y + half) // BLOCK_SIZE) + 1):
+                    cells.setdefault(((obj_id, rotation, color_id), cx, cy), []).append(obj)
+
+    if not cells:
+        return objects
+    kept = []
+    for obj, (obj_id, x, y, rotation, color_id, groups, script, scale) in zip(objects, object_records(objects, PASS_FIELDS)):
+        if not script:
+            cell = ((obj_id, rotation, color_id), int(x // BLOCK_SIZE), int(y // BLOCK_SIZE))
+            if any(big != obj and big.scale > obj.scale and covers(big, obj) for big in cells.get(cell, ())):
+                continue
+        kept.append(obj)
+    return kept_objects(objects, kept)
+
+PASS_FUNCTIONS = {
+    "dedupe": dedupe,
+    "merge": merge,
+    "cull": cull,
+}
+
+def optimize_scenes(scenes, passes=PASSES):
+    # Returns copies of the scenes with the passes applied, in the order of
+    # PASSES, and how many objects each pass removed over all scenes.
+    unknown = set(passes) - set(PASS_FUNCTIONS)
+    if unknown:
+        raise ValueError(f"Unknown optimization passes {sorted(unknown)}, expected some of {PASSES}")
+    removed = {name: 0 for name in PASSES if name in passes}
+    optimized = []
+    # Scenes that are unchanged duplicates of an earlier one reuse its result.
+    results = []
+    for scene in scenes:
+        original = scene.objects
+        for other, objects, counts in results:
+            if isinstance(original, ObjectList) and original.same_objects(other):
+                break
+        else:
+            objects = original
+            counts = {}
+            for name in removed:
+                before = len(objects)
+                objects = PASS_FUNCTIONS[name](objects)
+                counts[name] = before - len(objects)
+            results.append((original, objects, counts))
+        for name, count in counts.items():
+            removed[name] += count
+        scene_copy = copy.copy(scene)
+        scene_copy.objects = objects
+        optimized.append(scene_copy)
+    return optimized, removed
@@ -0,0 +1,55 @@
+DEFAULT_COLOR = "#FFFFFF"
+CHANNELS = 1000
+
+def channel_id(color_id):
+    # Objects store the channel as an int; older projects use "Color1" or
+    # "Color 12" strings. Returns None for anything that is not a channel.
+    if color_id.__class__ is int:
+        return color_id
+    if isinstance(color_id, str) and color_id.startswith("Color"):
+        number = color_id[5:].strip()
+        if number.isdigit():
+            return int(number)
+    return None
+
+def channel_label(channel):
+    return f"Color {channel}"
+
+class Palette:
+    # Color channels 1..size. Only the channels that were edited are stored
+    # in overrides; fills is a flat list indexed by channel so the canvas can
+    # look a color up without parsing or hashing the id.
+    def __init__(self, size=CHANNELS, default=DEFAULT_COLOR, overrides=None):
+        self.size = size
+        self.default = default
+        self.overrides = {}
+        self.fills = [default] * (size + 1)
+        for channel, color in (overrides or {}).items():
+            self.set(channel, color)
+
+    def __len__(self):
+        return self.size
+
+    def valid(self, channel):
+        return channel is not None and 0 < channel <= self.size
+
+    def get(self, channel):
+        return self.fills[channel] if self.valid(channel) else self.default
+
+    def set(self, channel, color):
+        if not self.valid(channel):
+            raise ValueError(f"color channel {channel} is outside 1..{self.size}")
+        self.overrides[channel] = color
+        self.fills[channel] = color
+
+    def reset(self, channel):
+        if self.overrides.pop(channel, None) is not None:
+            self.fills[channel] = self.default
+
+    def fill(self, color_id):
+        if color_id.__class__ is int and 0 < color_id <= self.size:
+            return self.fills[color_id]
+        return self.get(channel_id(color_id))
+
+    def copy(self):
+        return Palette(self.size, self.default, self.overrides)
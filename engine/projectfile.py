@@ -0,0 +1,270 @@
+"""
+Binary project files (.gdproj), a compact alternative to the JSON projects
+that opens without parsing the whole file. Layout, little endian:
+
+    header        magic, version, scenesNumber, scene count, value count,
+                  offsets of the value table and of the scene index
+    objects       per scene, one fixed width record per object
+    value table   every distinct name, script, color id and group list once,
+                  as JSON text, with an offset table in front
+    scene index   per scene its name, id, and where its records are
+
+The file is opened with mmap and only the header, the scene index and the
+value offsets are read up front. A scene's objects are decoded the first
+time they are used, straight into a SceneStore.
+
+    python -m engine.projectfile test.json test.gdproj
+    python -m engine.projectfile test.gdproj test.json
+
+converts between the two formats.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import weakref
+from array import array
+
+import numpy as np
+
+from engine import scene as scene_model
+from engine.importer import import_project
+from engine.scene import FIELDS, COLUMN_TYPES, SHARED, Scene, SceneStore, ObjectList, SharedTable
+
+MAGIC = b"GDEP"
+VERSION = 1
+EXTENSION = ".gdproj"
+HEADER = struct.Struct("<4sHHiIIQQ")
+SCENE_ENTRY = struct.Struct("<IiQQ")
+# One object, fields in FIELDS order. Shared fields hold a value table index.
+RECORD = np.dtype([(field, "<u4" if field in SHARED else ("<i4" if typecode == "i" else "<f8"))
+                   for field, typecode in zip(FIELDS, COLUMN_TYPES)])
+
+class ProjectFileError(Exception):
+    pass
+
+def is_binary_project(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def encode_value(value):
+    return json.dumps(value, separators=(",", ":"))
+
+def write_padding(file, alignment=8):
+    file.write(b"\0" * (-file.tell() % alignment))
+
+def scene_records(scene, values):
+    # The scene's objects as a RECORD array, shared fields mapped from the
+    # store's own tables to the project wide value table.
+    objects = scene.objects
+    if not isinstance(objects, ObjectList):
+        objects = ObjectList(objects=objects)
+    store = objects.store
+    rows = np.frombuffer(objects.order, dtype=np.int64)
+    records = np.empty(len(rows), dtype=RECORD)
+    for field, column, table in zip(FIELDS, store.columns, store.tables):
+        data = np.frombuffer(column, dtype=column.typecode)[rows]
+        if table is not None:
+            used = np.unique(data)
+            mapping = np.zeros(len(table.values), dtype=np.uint32)
+            mapping[used] = [values.intern(encode_value(table.values[index])) for index in used.tolist()]
+            data = mapping[data]
+        records[field] = data
+    return records
+
+def save_binary_project(scenes, filename):
+    write_binary_project(scenes, filename)
+    print(f"Project saved at: {filename}")
+
+def write_binary_project(scenes, filename):
+    # Written next to the target and moved over it, so a crash never leaves
+    # a half written project behind. Windows can't replace a file that is
+    # mapped, an open project of the same file is read into memory first.
+    values = SharedTable()
+    entries = []
+    tmp_path = filename + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        for scene in scenes:
+            records = scene_records(scene, values)
+            write_padding(f)
+            entries.append((values.intern(encode_value(scene.name)), scene.sceneID, f.tell(), len(records)))
+            f.write(records.tobytes())
+
+        write_padding(f)
+        values_offset = f.tell()
+        blobs = [value.encode() for value in values.values]
+        offsets = np.zeros(len(blobs) + 1, dtype="<u8")
+        np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+        f.write(offsets.tobytes())
+        f.writelines(blobs)
+
+        write_padding(f)
+        index_offset = f.tell()
+        for entry in entries:
+            f.write(SCENE_ENTRY.pack(*entry))
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, scene_model.scenesNumber, len(entries), len(blobs),
+                            values_offset, index_offset))
+    release_file(filename)
+    os.replace(tmp_path, filename)
+
+def release_file(filename):
+    # Unmaps every open project of filename, see ProjectFile.release. Call
+    # this before replacing or removing a project file.
+    for project in list(open_projects):
+        try:
+            same = os.path.samefile(project.filename, filename)
+        except OSError:
+            continue
+        if same:
+            project.release()
+
+# Every ProjectFile that still maps its file.
+open_projects = weakref.WeakSet()
+
+class ProjectFile:
+    def __init__(self, filename):
+        self.filename = filename
+        if os.path.getsize(filename) < HEADER.size:
+            raise ProjectFileError(f"{filename} is too short to be a project file")
+        with open(filename, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Scenes can be read on the journal thread while the editor saves.
+        self.lock = threading.RLock()
+        (magic, version, _, self.scenes_number, scene_count, value_count,
+         values_offset, index_offset) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ProjectFileError(f"{filename} is not a binary project")
+        if version != VERSION:
+            raise ProjectFileError(f"{filename} has version {version}, this engine reads version {VERSION}")
+        self.value_offsets = np.frombuffer(self.data, dtype="<u8", count=value_count + 1, offset=values_offset).tolist()
+        self.values_start = values_offset + 8 * (value_count + 1)
+        self.values = {}
+        self.entries = [SCENE_ENTRY.unpack_from(self.data, index_offset + i * SCENE_ENTRY.size)
+                        for i in range(scene_count)]
+        open_projects.add(self)
+
+    def value(self, index):
+        with self.lock:
+            if index in self.values:
+                return self.values[index]
+            start = self.values_start + self.value_offsets[index]
+            end = self.values_start + self.value_offsets[index + 1]
+            value = json.loads(self.data[start:end])
+            if isinstance(value, list):
+                value = tuple(value)
+            self.values[index] = value
+            return value
+
+    def scene_name(self, scene_index):
+        return self.value(self.entries[scene_index][0])
+
+    def read_objects(self, scene_index):
+        with self.lock:
+            return self.decode_objects(scene_index)
+
+    def decode_objects(self, scene_index):
+        _, _, offset, count = self.entries[scene_index]
+        records = np.frombuffer(self.data, dtype=RECORD, count=count, offset=offset)
+        columns = []
+        tables = []
+        for field, typecode in zip(FIELDS, COLUMN_TYPES):
+            data = records[field]
+            if field in SHARED:
+                used, data = np.unique(data, return_inverse=True)
+                tables.append([self.value(index) for index in used.tolist()])
+            else:
+                tables.append(None)
+            column = array(typecode)
+            column.frombytes(np.ascontiguousarray(data, dtype=typecode).tobytes())
+            columns.append(column)
+        del records
+        return ObjectList.from_store(SceneStore(columns, tables))
+
+    def release(self):
+        # Swaps the mapping for a copy of the file in memory. Scenes that were
+        # not read yet still read from it, but the file can now be replaced
+        # or deleted.
+        with self.lock:
+            if isinstance(self.data, mmap.mmap):
+                data = self.data
+                self.data = data[:]
+                data.close()
+        open_projects.discard(self)
+
+class LazyScene(Scene):
+    # Scene of a binary project, its objects are decoded the first time they
+    # are used. After that the scene no longer needs the file.
+    def __init__(self, name, project, index):
+        super().__init__(name)
+        self._project = project
+        self._index = index
+        self._objects = None
+
+    @property
+    def objects(self):
+        if self._objects is None:
+            self._objects = self._project.read_objects(self._index)
+            self._project = None
+        return self._objects
+
+    @objects.setter
+    def objects(self, objects):
+        self._objects = objects
+        self._project = None
+
+    def __getstate__(self):
+        # Pickled for the compiler's worker processes, the mmap can't go.
+        state = self.__dict__.copy()
+        state["_objects"] = self.objects
+        state["_project"] = None
+        return state
+
+    def snapshot(self):
+        # An unread scene stays unread, the copy reads the same file.
+        if self._objects is None:
+            copy = LazyScene.__new__(LazyScene)
+            copy.__dict__.update(self.__dict__)
+            return copy
+        return super().snapshot()
+
+def open_binary_project(filename):
+    project = ProjectFile(filename)
+    return [LazyScene(project.scene_name(i), project, i) for i in range(len(project.entries))]
+
+def open_project(filename):
+    # Binary or JSON, going by the first bytes of the file.
+    if is_binary_project(filename):
+        return open_binary_project(filename)
+    return import_project(filename)
+
+def save_any_project(scenes, filename):
+    # Binary for .gdproj files, JSON for anything else.
+    if filename.lower().endswith(EXTENSION):
+        save_binary_project(scenes, filename)
+    else:
+        scene_model.save_project(scenes, filename)
+
+def json_to_binary(source, target):
+    save_binary_project(import_project(source), target)
+
+def binary_to_json(source, target):
+    scene_model.save_project(open_binary_project(source), target)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert projects between JSON and the binary format.")
+    parser.add_argument("source")
+    parser.add_argument("target")
+    args = parser.parse_args(argv)
+    if is_binary_project(args.source):
+        binary_to_json(args.source, args.target)
+    else:
+        json_to_binary(args.source, args.target)
+
+if __name__ == "__main__":
+    main()
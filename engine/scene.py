@@ -0,0 +1,499 @@
+import json
+from array import array
+from itertools import chain
+import numpy as np
+
+scenesNumber = 0
+
+FIELDS = ("obj_id", "x", "y", "rotation", "color_id", "groups", "name", "script", "scale")
+# array typecode of every column. Numbers are stored as they are, the
+# other fields as an index into a table shared by the whole scene.
+COLUMN_TYPES = ("i", "d", "d", "d", "i", "i", "i", "i", "d")
+SHARED = {"color_id", "groups", "name", "script"}
+RECORD_BLOCK = 4096
+
+class SharedTable:
+    # Every distinct value is stored once, rows only keep its index.
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.indexes = {value: index for index, value in enumerate(self.values)}
+
+    def intern(self, value):
+        index = self.indexes.get(value)
+        if index is None:
+            index = len(self.values)
+            self.values.append(value)
+            self.indexes[value] = index
+        return index
+
+class SceneStore:
+    # The objects of a scene as columns, one typed array per field. Rows are
+    # only ever appended, removing an object from a scene just drops its row
+    # from the scene's order, so a row number always means the same object.
+    # Stores made with copy() share their columns copy-on-write, see writable.
+    def __init__(self, columns=None, tables=None):
+        # columns/tables fill the store from existing data: one array per
+        # field, and the values of each shared table (None for the others).
+        self.columns = columns or [array(typecode) for typecode in COLUMN_TYPES]
+        if tables is None:
+            self.tables = [SharedTable() if field in SHARED else None for field in FIELDS]
+        else:
+            self.tables = [None if values is None else SharedTable(values) for values in tables]
+        # Indexes of the columns another store may still be using.
+        self.shared = set()
+        (self.obj_id, self.x, self.y, self.rotation, self.color_id,
+         self.groups, self.name, self.script, self.scale) = self.columns
+
+    def __len__(self):
+        return len(self.obj_id)
+
+    def copy(self):
+        # Nothing is copied until one of the two stores changes a column,
+        # that store then copies just that column. Tables are only ever
+        # appended to, so they stay shared for good and every value the rows
+        # point at is still found.
+        store = SceneStore.__new__(SceneStore)
+        store.columns = list(self.columns)
+        store.tables = self.tables
+        store.shared = set(range(len(FIELDS)))
+        self.shared = set(range(len(FIELDS)))
+        (store.obj_id, store.x, store.y, store.rotation, store.color_id,
+         store.groups, store.name, store.script, store.scale) = store.columns
+        return store
+
+    def writable(self, index):
+        # The column at index, copied first if it may still be shared. The
+        # other store keeps its column marked and makes one copy too many
+        # when it writes, which is cheaper than counting users.
+        if index in self.shared:
+            column = self.columns[index]
+            column = array(column.typecode, column)
+            self.columns[index] = column
+            setattr(self, FIELDS[index], column)
+            self.shared.discard(index)
+        return self.columns[index]
+
+    def unshare(self):
+        for index in list(self.shared):
+            self.writable(index)
+
+    def append_rows(self, rows, dx=0, dy=0):
+        # Copies of the given rows appended in one go, moved by dx/dy (numbers
+        # or arrays, one per row). The copies point at the same table entries,
+        # names, groups and scripts are not interned again.
+        self.unshare()
+        start = len(self)
+        for index, column in enumerate(self.columns):
+            values = np.frombuffer(column, dtype=column.typecode)[rows]
+            if index == 1:
+                values = values + dx
+            elif index == 2:
+                values = values + dy
+            column.frombytes(values.tobytes())
+        return range(start, len(self))
+
+    def add_object(self, obj_id, x, y, rotation, color_id, groups, name, script, scale):
+        if self.shared:
+            self.unshare()
+        row = len(self.obj_id)
+        self.obj_id.append(obj_id)
+        self.x.append(x)
+        self.y.append(y)
+        self.rotation.append(rotation)
+        self.color_id.append(self.tables[4].intern(color_id))
+        self.groups.append(self.tables[5].intern(tuple(groups)))
+        self.name.append(self.tables[6].intern(name))
+        self.script.append(self.tables[7].intern(script))
+        self.scale.append(scale)
+        return row
+
+    def records(self, rows, fields=FIELDS):
+        # A tuple of the given fields for each row, groups as a tuple. Rows
+        # are read a block at a time with numpy, much faster than going
+        # through GameObject properties when every object is needed, as the
+        # compiler does.
+        indexes = [FIELDS.index(field) for field in fields]
+        return chain.from_iterable(self.record_blocks(rows, indexes))
+
+    def record_blocks(self, rows, indexes):
+        rows = np.asarray(rows, dtype=np.int64)
+        for start in range(0, len(rows), RECORD_BLOCK):
+            block = rows[start:start + RECORD_BLOCK]
+            fields = []
+            for index in indexes:
+                column = self.columns[index]
+                table = self.tables[index]
+                values = np.frombuffer(column, dtype=column.typecode)[block]
+                if table is not None:
+                    fields.append(map(table.values.__getitem__, values.tolist()))
+                elif column.typecode == "d":
+                    fields.append(_numbers(values))
+                else:
+                    fields.append(values.tolist())
+            yield zip(*fields)
+
+    def value(self, row, index):
+        value = self.columns[index][row]
+        table = self.tables[index]
+        if table is not None:
+            return table.values[value]
+        return _number(value) if COLUMN_TYPES[index] == "d" else value
+
+def _number(value):
+    # Columns hold doubles, give back 19 and not 19.0 for whole numbers so
+    # the generated code and saved projects look like they did before.
+    return int(value) if value.is_integer() else value
+
+def _numbers(values):
+    # _number over a numpy array of doubles.
+    whole = np.isfinite(values) & (values == np.trunc(values))
+    if whole.all():
+        return values.astype(np.int64).tolist()
+    result = values.tolist()
+    for index in np.flatnonzero(whole).tolist():
+        result[index] = int(result[index])
+    return result
+
+def _number_column(index, convert=_number):
+    def get(self):
+        if self.store is None:
+            return self._values[index]
+        return convert(self.store.columns[index][self.row])
+
+    def set(self, value):
+        if self.store is None:
+            self._values[index] = value
+        else:
+            self.store.writable(index)[self.row] = value
+    return property(get, set)
+
+def _shared_column(index, stored=None, loaded=None):
+    # stored/loaded convert between the field value and what is interned,
+    # group lists are kept as tuples so they can be shared.
+    def get(self):
+        store = self.store
+        if store is None:
+            return self._values[index]
+        value = store.tables[index].values[store.columns[index][self.row]]
+        return value if loaded is None else loaded(value)
+
+    def set(self, value):
+        store = self.store
+        if store is None:
+            self._values[index] = value
+        else:
+            store.writable(index)[self.row] = store.tables[index].intern(value if stored is None else stored(value))
+    return property(get, set)
+
+class GameObject:
+    # A view of one row of a SceneStore. GameObject(...) makes a detached
+    # object that keeps its own values until it is added to a scene, then it
+    # becomes a view of the row it was copied to. Views of the same row are
+    # equal and hash the same, so any of them can be used as a dict key.
+    # groups is handed out as a new list, assign it back to change it.
+    __slots__ = ("store", "row", "_values")
+
+    def __init__(self, obj_id, x=0, y=0, rotation=0, color_id=None, groups=None, name="", script="", scale=1):
+        self.store = None
+        self.row = -1
+        self._values = [obj_id, x, y, rotation, color_id, groups if groups is not None else [], name, script, scale]
+
+    @classmethod
+    def view(cls, store, row):
+        obj = cls.__new__(cls)
+        obj.store = store
+        obj.row = row
+        return obj
+
+    obj_id = _number_column(0, int)
+    x = _number_column(1)
+    y = _number_column(2)
+    rotation = _number_column(3)
+    color_id = _shared_column(4)
+    groups = _shared_column(5, tuple, list)
+    name = _shared_column(6)
+    script = _shared_column(7)
+    scale = _number_column(8)
+
+    def __eq__(self, other):
+        if not isinstance(other, GameObject):
+            return NotImplemented
+        if self.store is None:
+            return self is other
+        return self.store is other.store and self.row == other.row
+
+    def __hash__(self):
+        # Views of different scenes can share a hash, __eq__ tells them apart.
+        if self.store is None:
+            return id(self)
+        return self.row
+
+    def __repr__(self):
+        return f"GameObject({self.obj_id}, {self.x}, {self.y}, name={self.name!r})"
+
+    def values(self):
+        if self.store is None:
+            return list(self._values)
+        return [getattr(self, field) for field in FIELDS]
+
+    def record(self, fields=FIELDS):
+        if self.store is None:
+            values = dict(zip(FIELDS, self._values))
+            values["groups"] = tuple(values["groups"])
+            return tuple(values[field] for field in fields)
+        return tuple(self.store.value(self.row, FIELDS.index(field)) for field in fields)
+
+    def to_dict(self):
+        return dict(zip(FIELDS, self.values()))
+
+    def get_position(self):
+        return self.x, self.y
+
+
+class ObjectList:
+    # The objects of a scene in order, as rows of a SceneStore. Behaves like
+    # a list of GameObject, indexing and iterating hand out views. Like the
+    # store, the order of a copy() is shared until one of the lists changes.
+    def __init__(self, store=None, objects=()):
+        self.store = store if store is not None else SceneStore()
+        self.order = array("q")
+        self.order_shared = False
+        self.extend(objects)
+
+    @classmethod
+    def from_store(cls, store):
+        # Every row of store, in row order.
+        objects = cls(store)
+        objects.order = array("q", range(len(store)))
+        return objects
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        store = self.store
+        new = GameObject.__new__
+        for row in self.order:
+            obj = new(GameObject)
+            obj.store = store
+            obj.row = row
+            yield obj
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [GameObject.view(self.store, row) for row in self.order[index]]
+        return GameObject.view(self.store, self.order[index])
+
+    def __setitem__(self, index, obj):
+        row = self.adopt(obj)
+        self.own_order()[index] = row
+
+    def __delitem__(self, index):
+        del self.own_order()[index]
+
+    def __contains__(self, obj):
+        return isinstance(obj, GameObject) and obj.store is self.store and obj.row in self.order
+
+    def __repr__(self):
+        return f"ObjectList({len(self)} objects)"
+
+    def records(self, fields=FIELDS):
+        return self.store.records(self.order, fields)
+
+    def copy(self):
+        # A copy-on-write copy, it costs next to nothing until one of the two
+        # lists or their objects change.
+        result = ObjectList.__new__(ObjectList)
+        result.store = self.store.copy()
+        result.order = self.order
+        result.order_shared = self.order_shared = True
+        return result
+
+    def same_objects(self, other):
+        # True when other is an unchanged copy of this list (or the other way
+        # round), so both hold the same objects without comparing them.
+        return (isinstance(other, ObjectList) and self.order is other.order
+                and all(a is b for a, b in zip(self.store.columns, other.store.columns)))
+
+    def own_order(self):
+        if self.order_shared:
+            self.order = array("q", self.order)
+            self.order_shared = False
+        return self.order
+
+    def shared(self, objects):
+        # A list over the same store holding some of its objects, nothing is
+        # copied. The optimizer uses this for the objects it keeps.
+        result = ObjectList.__new__(ObjectList)
+        result.store = self.store
+        result.order = array("q", [obj.row for obj in objects])
+        result.order_shared = False
+        return result
+
+    def adopt(self, obj):
+        # Row of obj in this store. A detached object is copied in and turned
+        # into a view, an object of another store is copied.
+        if obj.store is self.store:
+            return obj.row
+        if obj.store is None:
+            row = self.store.add_object(*obj._values)
+            obj.store = self.store
+            obj.row = row
+            obj._values = None
+            return row
+        return self.store.add_object(*obj.values())
+
+    def add(self, obj_id, x=0, y=0, rotation=0, color_id=None, groups=(), name="", script="", scale=1):
+        # Like append(GameObject(...)) without making the object first.
+        row = self.store.add_object(obj_id, x, y, rotation, color_id, groups, name, script, scale)
+        self.own_order().append(row)
+        return GameObject.view(self.store, row)
+
+    def instance(self, objects, dx=0, dy=0, count=1):
+        # count copies of objects, the k-th one moved by k times (dx, dy),
+        # added after the other objects and returned in the same order. The
+        # copies are made column by column straight from the store and share
+        # the names, groups and scripts of the originals.
+        objects = list(objects)
+        store = self.store
+        if not all(obj.store is store for obj in objects):
+            copies = []
+            for k in range(1, count + 1):
+                for obj in objects:
+                    obj_id, x, y, rotation, color_id, groups, name, script, scale = obj.values()
+                    copies.append(self.add(obj_id, x + dx * k, y + dy * k, rotation, color_id, groups, name, script, scale))
+            return copies
+        rows = np.fromiter((obj.row for obj in objects), np.int64, len(objects))
+        steps = np.repeat(np.arange(1, count + 1), len(rows))
+        new_rows = store.append_rows(np.tile(rows, count), steps * dx, steps * dy)
+        self.own_order().extend(new_rows)
+        return [GameObject.view(store, row) for row in new_rows]
+
+    def add_dict(self, obj_data):
+        # One object of a saved project.
+        return self.add(
+            obj_id=obj_data["obj_id"],
+            x=obj_data["x"],
+            y=obj_data["y"],
+            rotation=obj_data["rotation"],
+            color_id=obj_data["color_id"],
+            groups=obj_data["groups"],
+            name=obj_data["name"],
+            script=obj_data["script"],
+            scale=obj_data.get("scale", 1)
+        )
+
+    def append(self, obj):
+        row = self.adopt(obj)
+        self.own_order().append(row)
+
+    def extend(self, objects):
+        order = self.own_order()
+        for obj in objects:
+            order.append(self.adopt(obj))
+
+    def insert(self, index, obj):
+        row = self.adopt(obj)
+        self.own_order().insert(index, row)
+
+    def pop(self, index=-1):
+        return GameObject.view(self.store, self.own_order().pop(index))
+
+    def index(self, obj):
+        if isinstance(obj, GameObject) and obj.store is self.store:
+            return self.order.index(obj.row)
+        raise ValueError(f"{obj!r} is not in the scene")
+
+    def remove(self, obj):
+        del self.own_order()[self.index(obj)]
+
+    def clear(self):
+        self.order = array("q")
+        self.order_shared = False
+
+
+class Scene:
+    def __init__(self, name):
+        global scenesNumber
+        scenesNumber += 1
+        self.name = name
+        self.sceneID = 800 + scenesNumber
+        self.objects = ObjectList()
+
+    def duplicate(self, name):
+        # A new scene with the same objects, shared with this one until
+        # either of them is edited.
+        scene = Scene(name)
+        objects = self.objects
+        if isinstance(objects, ObjectList):
+            scene.objects = objects.copy()
+        else:
+            scene.objects.extend(GameObject(*obj.values()) for obj in objects)
+        return scene
+
+    def snapshot(self):
+        # Copy with the same name and id whose objects no longer change with
+        # this scene, for writing it out on another thread.
+        copy = self.__class__.__new__(self.__class__)
+        copy.__dict__.update(self.__dict__)
+        objects = self.objects
+        if isinstance(objects, ObjectList):
+            copy.objects = objects.copy()
+        else:
+            copy.objects = ObjectList(objects=[GameObject(*obj.values()) for obj in objects])
+        return copy
+    
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "objects": [dict(zip(FIELDS, record)) for record in object_records(self.objects)],
+            "id": self.sceneID
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        scene = cls(data["name"])
+        for obj_data in data["objects"]:
+            scene.objects.add_dict(obj_data)
+        return scene
+
+
+def object_records(objects, fields=FIELDS):
+    # Field tuples of a scene's objects, see SceneStore.records. Works for an
+    # ObjectList and for plain lists of objects (what optimize_scenes returns),
+    # where runs of objects from the same store are still read together.
+    if isinstance(objects, ObjectList):
+        return objects.records(fields)
+    return chain.from_iterable(_record_runs(objects, fields))
+
+def _record_runs(objects, fields):
+    store = None
+    rows = []
+    for obj in objects:
+        if obj.store is not store:
+            if rows:
+                yield store.records(rows, fields)
+                rows = []
+            store = obj.store
+        if store is None:
+            yield (obj.record(fields),)
+        else:
+            rows.append(obj.row)
+    if rows:
+        yield store.records(rows, fields)
+
+
+def project_to_dict(scenes):
+    return {
+        "scenesNumber": scenesNumber,
+        "scenes": [scene.to_dict() for scene in scenes]
+        }
+
+def save_project(scenes, filename):
+    with open(filename, "w") as f:
+        json.dump(project_to_dict(scenes), f, indent=4)
+
+def load_project(filename):
+    with open(filename, "r") as f:
+        data = json.load(f)
+    return [Scene.from_dict(scene_data) for scene_data in data["scenes"]]
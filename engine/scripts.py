@@ -0,0 +1,122 @@
+"""
+Turns object scripts into spwn trigger functions that call the engine
+runtime. Every distinct script is translated once and shared by all the
+objects using it.
+
+    wait(1)
+    change_scene(1)
+
+becomes
+
+    script_1b2c3d4e5f60 = !{
+        wait(1)
+        change_scene(1)
+    };
+"""
+
+import hashlib
+import os
+import re
+
+from engine.workspace import ENGINE_FUNC_FOLDER
+from engine.scene import object_records
+
+BUILTINS = {"wait"}
+CALL = re.compile(r"^([A-Za-z_]\w*)\s*\((.*)\)\s*;?$")
+DEFINITION = re.compile(r"^([A-Za-z_]\w*)\s*=\s*\(", re.MULTILINE)
+STRING = re.compile(r"\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'")
+BRACKETS = {"(": ")", "[": "]", "{": "}"}
+
+# Script text -> CompiledScript, objects sharing a script only translate and
+# hash it once.
+_cache = {}
+_runtime_functions = None
+
+class ScriptError(Exception):
+    pass
+
+class CompiledScript:
+    def __init__(self, digest, statements):
+        self.digest = digest
+        self.name = f"script_{digest[:12]}"
+        self.statements = statements
+
+    def code(self):
+        body = "".join(f"    {statement}\n" for statement in self.statements)
+        return f"{self.name} = !{{\n{body}}};\n"
+
+def runtime_functions():
+    global _runtime_functions
+    if _runtime_functions is None:
+        names = set(BUILTINS)
+        if os.path.exists(ENGINE_FUNC_FOLDER):
+            for item in os.listdir(ENGINE_FUNC_FOLDER):
+                item_path = os.path.join(ENGINE_FUNC_FOLDER, item)
+                if os.path.isfile(item_path):
+                    with open(item_path, 'r') as f:
+                        names.update(DEFINITION.findall(f.read()))
+        _runtime_functions = names
+    return _runtime_functions
+
+def single_call(arguments):
+    # True when the arguments CALL matched close every bracket they open and
+    # hold no ";", so "wait(1); other(2)" is not taken for one call to wait.
+    expected = []
+    pos = 0
+    while pos < len(arguments):
+        char = arguments[pos]
+        if char in "\"'":
+            string = STRING.match(arguments, pos)
+            if string is None:
+                return False
+            pos = string.end()
+            continue
+        if char in BRACKETS:
+            expected.append(BRACKETS[char])
+        elif char in ")]}":
+            if not expected or expected.pop() != char:
+                return False
+        elif char == ";":
+            return False
+        pos += 1
+    return not expected
+
+def translate(script):
+    statements = []
+    known = runtime_functions()
+    for number, line in enumerate(script.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith("//"):
+            continue
+        match = CALL.match(line)
+        if not match or not single_call(match.group(2)):
+            raise ScriptError(f"line {number}: expected a function call, got {line!r}")
+        if match.group(1) not in known:
+            raise ScriptError(f"line {number}: unknown function {match.group(1)!r}")
+        statements.append(f"{match.group(1)}({match.group(2).strip()})")
+    return statements
+
+def compile_script(script):
+    compiled = _cache.get(script)
+    if compiled is None:
+        compiled = CompiledScript(hashlib.sha1(script.encode()).hexdigest(), translate(script))
+        _cache[script] = compiled
+    return compiled
+
+def compile_scene_scripts(scenes):
+    # Returns the shared functions in first-use order and, per scene, the
+    # function names its objects call.
+    functions = {}
+    scene_calls = []
+    for scene in scenes:
+        calls = []
+        for name, script in object_records(scene.objects, ("name", "script")):
+            if script:
+                try:
+                    compiled = compile_script(script)
+                except ScriptError as e:
+                    raise ScriptError(f"Script of object {name!r} in scene {scene.name!r}, {e}") from None
+                functions.setdefault(compiled.digest, compiled)
+                calls.append(compiled.name)
+        scene_calls.append(calls)
+    return list(functions.values()), scene_calls
@@ -0,0 +1,88 @@
+"""
+Name and group lookup for the objects of a scene, used to filter the object
+list. Queries:
+
+    text        objects whose name contains text (case insensitive)
+    ^text       objects whose name starts with text
+    group:name  objects in the group name
+
+Results are object indexes in scene order.
+"""
+
+from bisect import bisect_right
+
+from engine.scene import object_records
+
+class ObjectSearch:
+    def __init__(self, objects):
+        # objects is the scene's own list, the search is told about every
+        # change to it through add/remove/rename.
+        self.objects = objects
+        self._names = [str(name).lower() for name, in object_records(objects, ("name",))]
+        self._blob = None
+        self._offsets = None
+        self._groups = None
+
+    def add(self, obj):
+        self._names.append(str(obj.name).lower())
+        self._blob = None
+        self._groups = None
+
+    def remove(self, index):
+        del self._names[index]
+        self._blob = None
+        self._groups = None
+
+    def rename(self, index):
+        self._names[index] = str(self.objects[index].name).lower()
+        self._blob = None
+
+    def groups_changed(self):
+        self._groups = None
+
+    def _build_blob(self):
+        # Every name on its own line in one string, so a search is a few
+        # str.find calls in C instead of a Python loop over the objects.
+        # Newlines in names would break the line mapping, they never match.
+        names = [name.replace("\n", " ") for name in self._names]
+        self._blob = "\n" + "\n".join(names) + "\n"
+        offsets = []
+        position = 1
+        for name in names:
+            offsets.append(position)
+            position += len(name) + 1
+        self._offsets = offsets
+
+    def _build_groups(self):
+        groups = {}
+        for index, (object_groups,) in enumerate(object_records(self.objects, ("groups",))):
+            for group in object_groups:
+                groups.setdefault(str(group).lower(), []).append(index)
+        self._groups = groups
+
+    def search(self, query):
+        query = query.strip().lower()
+        if not query:
+            return None
+        if query.startswith("group:"):
+            if self._groups is None:
+                self._build_groups()
+            return list(self._groups.get(query[len("group:"):].strip(), []))
+
+        if self._blob is None:
+            self._build_blob()
+        needle = query
+        if query.startswith("^"):
+            needle = "\n" + query[1:]
+        if "\n" in needle.lstrip("\n"):
+            return []
+        matches = []
+        last = -1
+        position = self._blob.find(needle)
+        while position != -1:
+            index = bisect_right(self._offsets, position if needle[0] != "\n" else position + 1) - 1
+            if index != last:
+                matches.append(index)
+                last = index
+            position = self._blob.find(needle, position + 1)
+        return matches
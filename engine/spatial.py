@@ -0,0 +1,133 @@
+"""
+Uniform grid over the objects of a scene, used by the editor for picking and
+region queries. Objects are stored in the cell that holds their position,
+every query only looks at the cells it overlaps, so the cost depends on how
+many objects are near the query and not on the size of the scene.
+"""
+
+from math import floor, hypot
+
+import numpy as np
+
+class SpatialGrid:
+    def __init__(self, cell_size=64, half_size=10):
+        # half_size is half the width of an object as drawn on the canvas.
+        self.cell_size = cell_size
+        self.half_size = half_size
+        self._cells = {}
+        self._where = {}
+
+    def __len__(self):
+        return len(self._where)
+
+    def cell(self, x, y):
+        return floor(x / self.cell_size), floor(y / self.cell_size)
+
+    def build(self, objects):
+        self._cells = {}
+        self._where = {}
+        for obj in objects:
+            self.insert(obj)
+
+    def insert(self, obj):
+        cell = self.cell(obj.x, obj.y)
+        self._cells.setdefault(cell, {})[obj] = None
+        self._where[obj] = cell
+
+    def remove(self, obj):
+        cell = self._where.pop(obj, None)
+        if cell is not None:
+            bucket = self._cells[cell]
+            del bucket[obj]
+            if not bucket:
+                del self._cells[cell]
+
+    def move(self, obj):
+        cell = self.cell(obj.x, obj.y)
+        if self._where.get(obj) != cell:
+            self.remove(obj)
+            self.insert(obj)
+
+    def move_many(self, objects, xs, ys):
+        # Same as move for every object, with the cells worked out from the
+        # position arrays of a bulk transform instead of object by object.
+        # Moving most of the grid is cheaper as a single rebuild.
+        columns = np.floor(np.asarray(xs) / self.cell_size), np.floor(np.asarray(ys) / self.cell_size)
+        cells = zip(*(column.astype(np.int64).tolist() for column in columns))
+        if 2 * len(objects) < len(self._where):
+            for obj, cell in zip(objects, cells):
+                if self._where.get(obj) != cell:
+                    self.remove(obj)
+                    self._cells.setdefault(cell, {})[obj] = None
+                    self._where[obj] = cell
+            return
+        self._where.update(zip(objects, cells))
+        self._cells = {}
+        for obj, cell in self._where.items():
+            self._cells.setdefault(cell, {})[obj] = None
+
+    def _objects_in_cells(self, x0, y0, x1, y1):
+        cx0, cy0 = self.cell(x0, y0)
+        cx1, cy1 = self.cell(x1, y1)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = self._cells.get((cx, cy))
+                if bucket:
+                    yield from bucket
+
+    def query_rect(self, x0, y0, x1, y1):
+        # Objects whose box overlaps the rectangle, corners in any order.
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        h = self.half_size
+        return [obj for obj in self._objects_in_cells(x0 - h, y0 - h, x1 + h, y1 + h)
+                if x0 - h <= obj.x <= x1 + h and y0 - h <= obj.y <= y1 + h]
+
+    def query_point(self, x, y):
+        # The object under the point, the one drawn last wins like on the canvas.
+        hits = self.query_rect(x, y, x, y)
+        return hits[-1] if hits else None
+
+    def nearest(self, x, y, max_distance=None):
+        # Searches rings of cells around the point until the closest object
+        # found is nearer than anything the next ring could hold.
+        if not self._where:
+            return None
+        cx, cy = self.cell(x, y)
+        best = None
+        best_distance = None
+        ring = 0
+        max_ring = None
+        if max_distance is not None:
+            max_ring = int(max_distance // self.cell_size) + 1
+        while True:
+            for cell in self._ring(cx, cy, ring):
+                for obj in self._cells.get(cell, ()):
+                    distance = hypot(obj.x - x, obj.y - y)
+                    if best_distance is None or distance < best_distance:
+                        best, best_distance = obj, distance
+            if best_distance is not None and best_distance <= ring * self.cell_size:
+                break
+            if max_ring is not None and ring >= max_ring:
+                break
+            if best_distance is None and ring > self._max_ring(cx, cy):
+                break
+            ring += 1
+        if max_distance is not None and (best_distance is None or best_distance > max_distance):
+            return None
+        return best
+
+    def _ring(self, cx, cy, ring):
+        if ring == 0:
+            yield cx, cy
+            return
+        for dx in range(-ring, ring + 1):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+        for dy in range(-ring + 1, ring):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
+
+    def _max_ring(self, cx, cy):
+        # Past this ring there are no occupied cells left to look at.
+        return max(max(abs(x - cx), abs(y - cy)) for x, y in self._cells)
@@ -0,0 +1,111 @@
+"""
+Bulk transforms for a selection of objects. The positions, rotations and
+scales are copied into numpy arrays once, every operation is a single array
+expression over the whole selection, and apply() writes the result back.
+"""
+
+import numpy as np
+
+class BulkTransform:
+    def __init__(self, objects):
+        self.objects = list(objects)
+        count = len(self.objects)
+        store = self.objects[0].store if self.objects else None
+        if store is not None and all(obj.store is store for obj in self.objects):
+            # Objects of one scene are read straight from its columns.
+            self.store = store
+            self.rows = np.fromiter((obj.row for obj in self.objects), np.intp, count)
+            self.x = np.frombuffer(store.x)[self.rows]
+            self.y = np.frombuffer(store.y)[self.rows]
+            self.rotation = np.frombuffer(store.rotation)[self.rows]
+            self.scale = np.frombuffer(store.scale)[self.rows]
+        else:
+            self.store = None
+            self.x = np.fromiter((obj.x for obj in self.objects), float, count)
+            self.y = np.fromiter((obj.y for obj in self.objects), float, count)
+            self.rotation = np.fromiter((obj.rotation for obj in self.objects), float, count)
+            self.scale = np.fromiter((obj.scale for obj in self.objects), float, count)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def center(self):
+        # Middle of the bounding box of the selection.
+        if not self.objects:
+            return 0.0, 0.0
+        return (self.x.min() + self.x.max()) / 2, (self.y.min() + self.y.max()) / 2
+
+    def translate(self, dx, dy):
+        self.x += dx
+        self.y += dy
+
+    def rotate(self, angle, pivot=None):
+        # Degrees, clockwise on the canvas like GameObject.rotation.
+        px, py = pivot if pivot is not None else self.center()
+        a = np.radians(angle)
+        dx = self.x - px
+        dy = self.y - py
+        # Rounded so a quarter turn of (10, 0) gives (0, 10) and not 6e-16.
+        self.x = np.round(px + dx * np.cos(a) - dy * np.sin(a), 6)
+        self.y = np.round(py + dx * np.sin(a) + dy * np.cos(a), 6)
+        self.rotation = (self.rotation + angle) % 360
+
+    def scale_by(self, factor, pivot=None):
+        px, py = pivot if pivot is not None else self.center()
+        self.x = px + (self.x - px) * factor
+        self.y = py + (self.y - py) * factor
+        self.scale *= factor
+
+    def mirror(self, axis="x", pivot=None):
+        # axis "x" flips left/right, "y" flips top/bottom.
+        px, py = pivot if pivot is not None else self.center()
+        if axis == "x":
+            self.x = 2 * px - self.x
+            self.rotation = (180 - self.rotation) % 360
+        elif axis == "y":
+            self.y = 2 * py - self.y
+            self.rotation = -self.rotation % 360
+        else:
+            raise ValueError(f"unknown mirror axis {axis!r}")
+
+    def align(self, edge):
+        if not self.objects:
+            return
+        if edge == "left":
+            self.x[:] = self.x.min()
+        elif edge == "right":
+            self.x[:] = self.x.max()
+        elif edge == "top":
+            self.y[:] = self.y.min()
+        elif edge == "bottom":
+            self.y[:] = self.y.max()
+        elif edge == "center_x":
+            self.x[:] = self.center()[0]
+        elif edge == "center_y":
+            self.y[:] = self.center()[1]
+        else:
+            raise ValueError(f"unknown align edge {edge!r}")
+
+    def distribute(self, axis="x"):
+        # Spaces the objects evenly between the two outermost ones, keeping
+        # their order along the axis.
+        if len(self.objects) < 3:
+            return
+        values = self.x if axis == "x" else self.y
+        order = np.argsort(values, kind="stable")
+        values[order] = np.linspace(values[order[0]], values[order[-1]], len(values))
+
+    def apply(self):
+        if self.store is not None:
+            store = self.store
+            np.frombuffer(store.writable(1))[self.rows] = self.x
+            np.frombuffer(store.writable(2))[self.rows] = self.y
+            np.frombuffer(store.writable(3))[self.rows] = self.rotation
+            np.frombuffer(store.writable(8))[self.rows] = self.scale
+            return
+        for obj, x, y, rotation, scale in zip(self.objects, self.x.tolist(), self.y.tolist(),
+                                              self.rotation.tolist(), self.scale.tolist()):
+            obj.x = x
+            obj.y = y
+            obj.rotation = rotation
+            obj.scale = scale
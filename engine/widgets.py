@@ -0,0 +1,103 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter import font as tkfont
+
+class VirtualList(ttk.Frame):
+    # A list that only holds the rows that fit on screen. The rows come from
+    # row_count() and row_text(index), so the model can have any size and
+    # scrolling just refills the visible rows.
+    def __init__(self, parent, row_count, row_text, on_select=None, rows=20):
+        super().__init__(parent)
+        self.row_count = row_count
+        self.row_text = row_text
+        self.on_select = on_select
+        self.rows = rows
+        self.top = 0
+        self.selected = None
+
+        self.listbox = tk.Listbox(self, selectmode=tk.SINGLE, height=rows, exportselection=False)
+        self.listbox.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.listbox.bind("<ButtonRelease-1>", self.click)
+        self.listbox.bind("<MouseWheel>", self.wheel)
+        self.listbox.bind("<Button-4>", self.wheel)
+        self.listbox.bind("<Button-5>", self.wheel)
+        self.listbox.bind("<Configure>", self.resize)
+
+    def resize(self, event):
+        line = tkfont.nametofont("TkDefaultFont").metrics("linespace") + 1
+        rows = max(1, event.height // line)
+        if rows != self.rows:
+            self.rows = rows
+            self.refresh()
+
+    def refresh(self):
+        count = self.row_count()
+        self.top = max(0, min(self.top, count - self.rows))
+        end = min(count, self.top + self.rows)
+        self.listbox.delete(0, tk.END)
+        for index in range(self.top, end):
+            self.listbox.insert(tk.END, self.row_text(index))
+        self.show_selection()
+        if count:
+            self.scrollbar.set(self.top / count, end / count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def refresh_row(self, index):
+        if self.top <= index < self.top + self.rows and index < self.row_count():
+            row = index - self.top
+            if row < self.listbox.size():
+                self.listbox.delete(row)
+            self.listbox.insert(row, self.row_text(index))
+            self.show_selection()
+        else:
+            self.refresh_scrollbar()
+
+    def refresh_scrollbar(self):
+        count = self.row_count()
+        if count:
+            self.scrollbar.set(self.top / count, min(count, self.top + self.rows) / count)
+
+    def yview(self, *args):
+        count = self.row_count()
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * count)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.top += step * self.rows if args[2] == "pages" else step
+        self.refresh()
+
+    def wheel(self, event):
+        up = getattr(event, "delta", 0) > 0 or getattr(event, "num", None) == 4
+        self.yview("scroll", -3 if up else 3, "units")
+
+    def see(self, index):
+        if not self.top <= index < self.top + self.rows:
+            self.top = max(0, index - self.rows // 2)
+            self.refresh()
+
+    def show_selection(self):
+        self.listbox.selection_clear(0, tk.END)
+        if self.selected is not None and self.top <= self.selected < self.top + self.rows:
+            self.listbox.selection_set(self.selected - self.top)
+
+    def select(self, index):
+        self.selected = index
+        self.see(index)
+        self.show_selection()
+
+    def clear_selection(self):
+        self.selected = None
+        self.listbox.selection_clear(0, tk.END)
+
+    def curselection(self):
+        return () if self.selected is None else (self.selected,)
+
+    def click(self, event):
+        selection = self.listbox.curselection()
+        self.selected = self.top + selection[0] if selection else None
+        if self.on_select:
+            self.on_select(event)
@@ -0,0 +1,159 @@
+import os
+import shutil
+import hashlib
+import threading
+import time
+import uuid
+
+ENGINE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+UTILS_FOLDER = os.path.join(ENGINE_FOLDER, "utils")
+ENGINE_FUNC_FOLDER = os.path.join(ENGINE_FOLDER, "engine_func")
+RUNTIME_FOLDERS = [UTILS_FOLDER, ENGINE_FUNC_FOLDER]
+
+BUILDS_FOLDER = "builds"
+MAX_WORKSPACES = 8
+MAX_WORKSPACE_BYTES = 512 * 1024 * 1024
+# A build keeps a marker file in its folder until it is done, cleanup leaves
+# any folder holding one alone. A marker older than this was left behind by
+# a build that crashed and no longer counts.
+BUILD_MARKER = ".building-"
+STALE_BUILD_SECONDS = 24 * 60 * 60
+
+def runtime_files():
+    # Same layout copy_files used to produce: every file of every runtime
+    # folder ends up flat in the root of the workspace.
+    files = []
+    for folder in RUNTIME_FOLDERS:
+        if not os.path.exists(folder):
+            print(f"Warning: {folder} not found")
+            continue
+        for item in sorted(os.listdir(folder)):
+            item_path = os.path.join(folder, item)
+            if os.path.isfile(item_path):
+                files.append((item, item_path))
+    return files
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def runtime_hash(files):
+    digest = hashlib.sha1()
+    for name, path in files:
+        digest.update(name.encode())
+        digest.update(file_digest(path).encode())
+    return digest.hexdigest()[:16]
+
+def link_file(src, dest):
+    if os.path.exists(dest):
+        if os.path.samefile(src, dest) or file_digest(src) == file_digest(dest):
+            return
+    tmp_dest = f"{dest}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(src, tmp_dest)
+    except OSError:
+        shutil.copy2(src, tmp_dest)
+    os.replace(tmp_dest, dest)
+
+def folder_size(folder):
+    size = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+def build_marker(folder):
+    # One marker per process and thread, a thread runs one build at a time.
+    return os.path.join(folder, f"{BUILD_MARKER}{os.getpid()}-{threading.get_ident()}")
+
+def in_use(folder):
+    # True while a build runs in the folder or in one of its subfolders.
+    now = time.time()
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.startswith(BUILD_MARKER):
+                try:
+                    if now - os.path.getmtime(os.path.join(root, name)) < STALE_BUILD_SECONDS:
+                        return True
+                except OSError:
+                    pass
+    return False
+
+def cleanup_workspaces(builds_folder=BUILDS_FOLDER, keep=None, max_workspaces=MAX_WORKSPACES, max_bytes=MAX_WORKSPACE_BYTES):
+    # Least recently used workspaces go first, until both the count and the
+    # size budget are met. The workspace being built and the ones other
+    # builds are still running in are never removed.
+    if not os.path.isdir(builds_folder):
+        return []
+    workspaces = []
+    for item in os.listdir(builds_folder):
+        path = os.path.join(builds_folder, item)
+        if os.path.isdir(path):
+            workspaces.append((os.path.getmtime(path), path))
+    workspaces.sort(reverse=True)
+
+    removed = []
+    count = 0
+    total = 0
+    for _, path in workspaces:
+        size = folder_size(path)
+        is_kept = (keep is not None and os.path.abspath(path) == os.path.abspath(keep)) or in_use(path)
+        if is_kept or (count < max_workspaces and total + size <= max_bytes):
+            count += 1
+            total += size
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(path)
+        print(f"Removed stale build workspace: {path}")
+    return removed
+
+def prepare_workspace(build_folder=None, builds_folder=BUILDS_FOLDER, project=None):
+    # Workspaces are keyed by the hash of the runtime files, so every build
+    # with the same engine shares one folder and only links what changed.
+    # Each project builds in its own subfolder of it, so projects never write
+    # over each other's root file, and the subfolders of projects that were
+    # not built for a while are cleaned up like old workspaces. The folder is
+    # marked as in use before anything is cleaned up, call release_workspace
+    # once the build is over.
+    files = runtime_files()
+    if build_folder:
+        workspace = folder = build_folder
+    else:
+        workspace = os.path.join(builds_folder, runtime_hash(files))
+        folder = os.path.join(workspace, project) if project else workspace
+    os.makedirs(folder, exist_ok=True)
+    open(build_marker(folder), "w").close()
+    for name, path in files:
+        link_file(path, os.path.join(folder, name))
+    os.utime(folder)
+    if build_folder is None:
+        os.utime(workspace)
+        cleanup_workspaces(builds_folder, keep=workspace)
+        if folder != workspace:
+            cleanup_workspaces(workspace, keep=folder)
+    return folder
+
+def release_workspace(folder):
+    try:
+        os.remove(build_marker(folder))
+    except FileNotFoundError:
+        pass
+
+def prune_modules(folder, keep):
+    # Scene modules are named after their content, every edited scene leaves
+    # its old module behind. Removes the ones the last root file doesn't use.
+    removed = []
+    for name in os.listdir(folder):
+        if name.startswith("scene_") and name.endswith(".spwn") and name not in keep:
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                continue
+            removed.append(name)
+    return removed
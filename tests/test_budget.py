@@ -0,0 +1,15 @@
+from engine.budget import analyze
+
+def test_data_files_are_counted(tmp_path):
+    image = tmp_path / "data.txt"
+    image.write_text("10 x 20/...")
+    midi = tmp_path / "tmp.txt"
+    midi.write_text("ab c\n")
+    report = analyze([], image_data=[str(image)], midi_data=[str(midi)])
+    assert report.objects == 10 * 20 + 3
+    assert report.triggers == 3
+    assert report.errors == []
+
+def test_missing_data_file_fails(tmp_path):
+    report = analyze([], image_data=[str(tmp_path / "missing.txt")], midi_data=[str(tmp_path / "missing.mid.txt")])
+    assert len(report.errors) == 2
@@ -0,0 +1,24 @@
+import threading
+import time
+
+from engine.buildtrace import BuildTrace
+
+def test_cpu_leaves_out_other_threads():
+    busy = threading.Event()
+    def spin():
+        while not busy.is_set():
+            sum(range(1000))
+    other = threading.Thread(target=spin)
+    other.start()
+    trace = BuildTrace()
+    try:
+        with trace.phase("wait"):
+            time.sleep(0.2)
+            trace.add_cpu(1.5)
+    finally:
+        busy.set()
+        other.join()
+    phase = trace.phases[0]
+    assert phase["wall"] >= 0.2
+    assert 1.5 <= phase["cpu"] < 1.6
+    assert trace.to_dict()["cpu"] < 1.6
@@ -0,0 +1,19 @@
+import pytest
+
+from engine.importer import ProjectImportError, import_project
+
+OBJECT = '{"obj_id": %s, "x": 1, "y": 2, "rotation": 0, "color_id": null, "groups": [], "name": "n", "script": ""}'
+
+def write_project(path, obj_id):
+    path.write_text('{"scenes": [{"name": "a", "objects": [%s]}]}' % (OBJECT % obj_id))
+    return str(path)
+
+def test_import_project(tmp_path):
+    scenes = import_project(write_project(tmp_path / "ok.json", 5))
+    assert [scene.name for scene in scenes] == ["a"]
+    assert scenes[0].objects[0].obj_id == 5
+
+@pytest.mark.parametrize("obj_id", ["99999999999", "1.5", '"x"'])
+def test_import_project_bad_obj_id(tmp_path, obj_id):
+    with pytest.raises(ProjectImportError):
+        import_project(write_project(tmp_path / "bad.json", obj_id))
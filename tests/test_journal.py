@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from engine import projectfile
+from engine.journal import Journal
+from engine.scene import GameObject, Scene
+
+def write_project(path, names=("a", "b")):
+    scenes = []
+    for name in names:
+        scene = Scene(name)
+        scene.objects.extend([GameObject(1, x, 0) for x in range(10)])
+        scenes.append(scene)
+    projectfile.save_any_project(scenes, str(path))
+    return str(path)
+
+def stop(journal):
+    # Waits for the journal thread like close() but keeps the autosave, as
+    # if the editor had died.
+    journal.queue.put(("stop",))
+    journal.thread.join()
+    journal.thread = None
+
+def test_opened_project_is_not_copied(tmp_path):
+    filename = write_project(tmp_path / "project.gdproj")
+    scenes = projectfile.open_binary_project(filename)
+    journal = Journal(str(tmp_path / "autosave"))
+    journal.start(scenes, filename)
+    journal.record("set", 1, 2, {"name": "renamed"})
+    stop(journal)
+    assert not any(name.endswith(projectfile.EXTENSION) for name in os.listdir(journal.folder))
+    assert all(scene._objects is None for scene in scenes)
+    recovered = journal.recover()
+    assert [scene.name for scene in recovered] == ["a", "b"]
+    assert recovered[1].objects[2].name == "renamed"
+
+def test_save_starts_from_the_saved_file(tmp_path):
+    filename = write_project(tmp_path / "project.gdproj")
+    scenes = projectfile.open_binary_project(filename)
+    journal = Journal(str(tmp_path / "autosave"))
+    journal.start(scenes, filename)
+    journal.record("delete", 0, 0)
+    del scenes[0].objects[0]
+    journal.save(scenes, filename)
+    stop(journal)
+    assert journal.take_errors() == []
+    # The deletion is in the saved file, replaying it again would drop a
+    # second object.
+    assert len(journal.recover()[0].objects) == 9
+
+def test_changed_base_is_not_replayed(tmp_path):
+    filename = write_project(tmp_path / "project.json")
+    journal = Journal(str(tmp_path / "autosave"))
+    journal.start(projectfile.open_project(filename), filename)
+    journal.record("delete", 0, 0)
+    stop(journal)
+    write_project(tmp_path / "project.json", names=("other",))
+    with pytest.raises(projectfile.ProjectFileError):
+        journal.recover()
@@ -0,0 +1,24 @@
+import os
+
+from engine.compiler import decode_level_string, level_string_chunks
+from engine.projectfile import open_project
+
+TEST_PROJECT = os.path.join(os.path.dirname(__file__), os.pardir, "test.json")
+
+def test_level_string_round_trip():
+    scenes = open_project(TEST_PROJECT)
+    # One scaled object, so the SCALING key is written too.
+    scenes[-1].objects[0].scale = 1.5
+    decoded = decode_level_string("".join(level_string_chunks(scenes)))
+    expected = [(scene_group, obj) for scene_group, scene in enumerate(scenes, 800) for obj in scene.objects]
+    assert len(decoded) == len(expected)
+    for keys, (scene_group, obj) in zip(decoded, expected):
+        assert int(keys[1]) == obj.obj_id
+        assert float(keys[2]) == obj.x + 100
+        assert float(keys[3]) == obj.y + 100
+        assert float(keys[6]) == obj.rotation
+        assert int(keys[57]) == scene_group
+        if obj.scale == 1:
+            assert 32 not in keys
+        else:
+            assert float(keys[32]) == obj.scale
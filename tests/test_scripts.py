@@ -0,0 +1,11 @@
+import pytest
+
+from engine.scripts import ScriptError, translate
+
+def test_translate_calls():
+    assert translate('wait(1);\n// comment\nwait([1, 2], "a);(")') == ['wait(1)', 'wait([1, 2], "a);(")']
+
+@pytest.mark.parametrize("script", ["wait(1); undefined_fn(2)", "wait(1))", "wait((1)", "wait(1]"])
+def test_translate_rejects_more_than_one_call(script):
+    with pytest.raises(ScriptError):
+        translate(script)
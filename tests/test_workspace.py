@@ -0,0 +1,54 @@
+import glob
+import os
+import sys
+import threading
+import time
+
+import engine.compiler as compile
+from engine.projectfile import open_project
+from engine.workspace import MAX_WORKSPACES, in_use
+
+TEST_PROJECT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "test.json"))
+FAKE_SPWN = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "fake_spwn.py"))
+# Stands in for a slow spwn: waits for the go file, then fails unless the
+# root file it was asked to build is still there.
+SLOW_SPWN = """
+import os, sys, time
+open("started", "w").close()
+while not os.path.exists({go!r}):
+    time.sleep(0.01)
+sys.exit(0 if os.path.exists(sys.argv[2]) else 3)
+"""
+
+def wait_for(pattern):
+    deadline = time.monotonic() + 30
+    while not glob.glob(pattern):
+        assert time.monotonic() < deadline, f"{pattern} never showed up"
+        time.sleep(0.01)
+    return glob.glob(pattern)[0]
+
+def test_cleanup_keeps_running_builds(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    go = str(tmp_path / "go")
+    results = {}
+    slow = threading.Thread(target=lambda: results.setdefault("a", compile.compile_spwn(
+        open_project(TEST_PROJECT), "PROJ_a.compiled.spwn", "a", project="a",
+        spwn=[sys.executable, "-c", SLOW_SPWN.format(go=go)])))
+    slow.start()
+    try:
+        folder_a = os.path.dirname(wait_for(os.path.join("builds", "*", "a", "started")))
+        assert in_use(folder_a)
+        # The slow build looks like the least recently used project, behind
+        # more projects than a workspace keeps.
+        os.utime(folder_a, (0, 0))
+        for i in range(MAX_WORKSPACES):
+            os.makedirs(os.path.join(os.path.dirname(folder_a), f"other-{i}"))
+        result_b = compile.compile_spwn(open_project(TEST_PROJECT), "PROJ_b.compiled.spwn", "b", project="b",
+                                        spwn=[sys.executable, FAKE_SPWN])
+        assert result_b.returncode == 0
+        assert os.path.exists(os.path.join(folder_a, "PROJ_a.compiled.spwn"))
+    finally:
+        open(go, "w").close()
+        slow.join()
+    assert results["a"].returncode == 0
+    assert not in_use(folder_a)